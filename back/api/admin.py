@@ -75,7 +75,7 @@ class ManufacturerAdmin(admin.ModelAdmin):
 
 @admin.register(FiscalDevice)
 class FiscalDeviceAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'owner', 'status', 'sale_date', 'last_service_date')
+    list_display = ('__str__', 'owner', 'status', 'sale_date', 'last_service_date', 'next_service_date')
     list_filter = ('status', 'brand', 'owner__company')
     search_fields = ('model_name', 'serial_number', 'unique_number', 'owner__name')
     autocomplete_fields = ('owner', 'brand')
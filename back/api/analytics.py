@@ -0,0 +1,132 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, IntegerField, Q, Window
+from django.db.models.functions import Cast, Ceil, RowNumber
+from django.utils import timezone
+
+from .charts import get_chart_version
+from .models.manufacturers import Manufacturer
+from .models.tickets import ServiceTicket
+from .models.users import Technician
+
+ANALYTICS_DEFAULT_PERIOD_DAYS = 90
+ANALYTICS_MAX_PERIOD_DAYS = 2 * 366
+
+# wymiar -> pole grupowania zgłoszeń
+TIME_TO_CLOSE_DIMENSIONS = {
+    'technician': 'assigned_technician_id',
+    'ticket_type': 'ticket_type',
+    'manufacturer': 'device__brand_id',
+}
+
+TIME_TO_CLOSE = ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField())
+
+
+def get_analytics_cache_ttl():
+    return int(getattr(settings, 'ANALYTICS_CACHE_TTL', 60 * 60))
+
+
+def _seconds(value):
+    return round(value.total_seconds()) if value is not None else None
+
+
+def closed_tickets(company, date_from, date_to):
+    # Zakres po completed_at (indeks) - zgłoszenia zamknięte w okresie, niezależnie od daty utworzenia.
+    start = timezone.make_aware(datetime.combine(date_from, time.min))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return ServiceTicket.objects.filter(
+        client__company=company,
+        status=ServiceTicket.Status.CLOSED,
+        completed_at__gte=start,
+        completed_at__lt=end,
+    )
+
+
+def _percentiles(queryset, field):
+    """
+    Mediana i p90 (metoda najbliższej rangi) liczone w bazie funkcjami okna:
+    z każdej grupy pobierane są tylko dwa wiersze - na pozycjach ceil(0,5 n) i ceil(0,9 n).
+    """
+    partition = [F(field)]
+    rows = queryset.annotate(
+        duration=TIME_TO_CLOSE,
+        position=Window(RowNumber(), partition_by=partition, order_by=[TIME_TO_CLOSE.asc(), F('id').asc()]),
+        group_size=Window(Count('id'), partition_by=partition),
+    ).annotate(
+        median_position=Cast(Ceil(F('group_size') * 0.5), IntegerField()),
+        p90_position=Cast(Ceil(F('group_size') * 0.9), IntegerField()),
+    ).filter(
+        Q(position=F('median_position')) | Q(position=F('p90_position'))
+    ).values(field, 'duration', 'position', 'median_position', 'p90_position')
+
+    result = {}
+    for row in rows:
+        values = result.setdefault(row[field], {})
+        if row['position'] == row['median_position']:
+            values['median_seconds'] = _seconds(row['duration'])
+        if row['position'] == row['p90_position']:
+            values['p90_seconds'] = _seconds(row['duration'])
+    return result
+
+
+def _group_stats(queryset, field, labels):
+    summary = queryset.values(field).annotate(
+        count=Count('id'),
+        mean=Avg(TIME_TO_CLOSE),
+        scheduled_count=Count('id', filter=Q(scheduled_for__isnull=False)),
+        on_time_count=Count('id', filter=Q(completed_at__date__lte=F('scheduled_for'))),
+    ).order_by('-count')
+    percentiles = _percentiles(queryset, field)
+
+    return [
+        {
+            'key': row[field],
+            'label': labels.get(row[field], "Brak danych"),
+            'count': row['count'],
+            'mean_seconds': _seconds(row['mean']),
+            'median_seconds': percentiles.get(row[field], {}).get('median_seconds'),
+            'p90_seconds': percentiles.get(row[field], {}).get('p90_seconds'),
+            'scheduled_count': row['scheduled_count'],
+            'on_time_count': row['on_time_count'],
+        }
+        for row in summary
+    ]
+
+
+def _dimension_labels(company):
+    technicians = {
+        row['id']: f"{row['first_name']} {row['last_name']}"
+        for row in Technician.objects.filter(company=company).values('id', 'first_name', 'last_name')
+    }
+    technicians[None] = "Nieprzypisane"
+    return {
+        'technician': technicians,
+        'ticket_type': dict(ServiceTicket.TicketType.choices),
+        'manufacturer': dict(Manufacturer.objects.filter(company=company).values_list('id', 'name')),
+    }
+
+
+def build_time_to_close(company, date_from, date_to):
+    queryset = closed_tickets(company, date_from, date_to)
+    labels = _dimension_labels(company)
+
+    data = {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'total_closed': queryset.count(),
+    }
+    for dimension, field in TIME_TO_CLOSE_DIMENSIONS.items():
+        data[f'by_{dimension}'] = _group_stats(queryset, field, labels[dimension])
+    return data
+
+
+def get_time_to_close(company, date_from, date_to):
+    """Statystyki czasu realizacji z cache - klucz: firma, wersja danych pulpitu i okres."""
+    key = f'analytics:ttc:{company.id}:{get_chart_version(company.id)}:{date_from.isoformat()}:{date_to.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        data = build_time_to_close(company, date_from, date_to)
+        cache.set(key, data, get_analytics_cache_ttl())
+    return data
@@ -3,19 +3,23 @@ from channels.db import database_sync_to_async
 
 
 @database_sync_to_async
-def get_user_from_token(token):
-    from django.contrib.auth import get_user_model
+def get_identity_from_token(token):
     from django.contrib.auth.models import AnonymousUser
     from rest_framework_simplejwt.tokens import AccessToken
     from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+    from .context import CompanyContext, get_identity
 
-    User = get_user_model()
     try:
-        access = AccessToken(token)
-        user_id = access.get("user_id")
-        return User.objects.get(id=user_id)
-    except (User.DoesNotExist, KeyError, InvalidToken, TokenError):
-        return AnonymousUser()
+        # Podpis i ważność tokenu sprawdzane są lokalnie; użytkownik, serwisant i firma
+        # pochodzą z cache tożsamości (zapytanie do bazy tylko przy braku wpisu).
+        user_id = AccessToken(token).get("user_id")
+    except (KeyError, InvalidToken, TokenError):
+        user_id = None
+
+    identity = get_identity(user_id) if user_id else None
+    if identity is None or not identity[0].is_active:
+        return AnonymousUser(), CompanyContext()
+    return identity
 
 
 class TokenAuthMiddleware:
@@ -24,14 +28,15 @@ class TokenAuthMiddleware:
 
     async def __call__(self, scope, receive, send):
         from django.contrib.auth.models import AnonymousUser
+        from .context import CompanyContext
 
         query = parse_qs(scope["query_string"].decode())
         token = query.get("token", [None])[0]
 
         if token:
-            scope["user"] = await get_user_from_token(token)
+            scope["user"], scope["company_context"] = await get_identity_from_token(token)
         else:
-            scope["user"] = AnonymousUser()
+            scope["user"], scope["company_context"] = AnonymousUser(), CompanyContext()
 
         return await self.inner(scope, receive, send)
 
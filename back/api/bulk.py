@@ -0,0 +1,152 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .charts import bump_chart_version
+from .client_map import bump_client_map_version
+from .counters import bump_company_counters, rebuild_client_counters
+from .geocoding import normalize_address, get_min_interval
+from .models.clients import Client
+from .models.counters import ClientCounters
+from .models.devices import FiscalDevice, DeviceHistoryEntry
+from .models.geocoding import GeocodeCacheEntry
+from .models.manufacturers import Manufacturer
+
+BULK_MAX_ROWS = 1000
+BULK_BATCH_SIZE = 500
+
+
+def _duplicates(values):
+    return {value for value, count in Counter(values).items() if count > 1}
+
+
+def validate_bulk_clients(company, rows):
+    """Zwraca {indeks wiersza: błędy} - jedno zapytanie o wszystkie NIP-y paczki."""
+    nips = [row['nip'] for row in rows]
+    repeated = _duplicates(nips)
+    existing = set(Client.objects.filter(company=company, nip__in=set(nips)).values_list('nip', flat=True))
+
+    errors = {}
+    for index, nip in enumerate(nips):
+        if nip in existing:
+            errors[index] = {'nip': ["Klient o tym numerze NIP już istnieje w Twojej firmie."]}
+        elif nip in repeated:
+            errors[index] = {'nip': ["Numer NIP powtarza się w przesłanych danych."]}
+    return errors
+
+
+def validate_bulk_devices(company, rows):
+    """Zwraca {indeks wiersza: błędy} - po jednym zapytaniu o numery unikatowe, klientów i producentów."""
+    unique_numbers = [row['unique_number'] for row in rows]
+    repeated = _duplicates(unique_numbers)
+    existing = set(
+        FiscalDevice.objects.filter(unique_number__in=set(unique_numbers)).values_list('unique_number', flat=True)
+    )
+    owner_ids = set(Client.objects.filter(
+        company=company, id__in={row['owner'] for row in rows}
+    ).values_list('id', flat=True))
+    brand_ids = set(Manufacturer.objects.filter(
+        company=company, id__in={row['brand'] for row in rows}
+    ).values_list('id', flat=True))
+
+    errors = {}
+    for index, row in enumerate(rows):
+        row_errors = {}
+        if row['unique_number'] in existing:
+            row_errors['unique_number'] = ["Urządzenie o tym numerze unikatowym już istnieje."]
+        elif row['unique_number'] in repeated:
+            row_errors['unique_number'] = ["Numer unikatowy powtarza się w przesłanych danych."]
+        if row['owner'] not in owner_ids:
+            row_errors['owner'] = ["Klient nie należy do Twojej firmy."]
+        if row['brand'] not in brand_ids:
+            row_errors['brand'] = ["Producent nie należy do Twojej firmy."]
+        if row_errors:
+            errors[index] = row_errors
+    return errors
+
+
+def schedule_client_geocoding(clients):
+    # bulk_create nie przechodzi przez serializer: współrzędne z tabeli cache, resztę geokodujemy w tle
+    # (jedno zadanie na unikalny adres, rozłożone w czasie zgodnie z limitem Nominatim).
+    by_address = defaultdict(list)
+    addresses = {}
+    for client in clients:
+        key = normalize_address(client.address)
+        if key:
+            by_address[key].append(client.id)
+            addresses.setdefault(key, client.address)
+
+    cached = {
+        entry.address_key: entry
+        for entry in GeocodeCacheEntry.objects.filter(address_key__in=list(by_address))
+    }
+    pending = []
+    for key, client_ids in by_address.items():
+        entry = cached.get(key)
+        if entry is None:
+            pending.append((addresses[key], client_ids))
+        elif entry.found:
+            Client.objects.filter(pk__in=client_ids).update(latitude=entry.latitude, longitude=entry.longitude)
+
+    if pending:
+        from .tasks import geocode_client_address
+
+        interval = get_min_interval()
+
+        def enqueue():
+            for index, (address, client_ids) in enumerate(pending):
+                geocode_client_address.apply_async(args=(client_ids, address), countdown=index * interval)
+
+        transaction.on_commit(enqueue)
+
+
+@transaction.atomic
+def bulk_create_clients(company, rows):
+    Client.objects.bulk_create(
+        [Client(company=company, **row) for row in rows],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    # MySQL nie zwraca kluczy z bulk_create - pobieramy utworzone wiersze po (firma, NIP).
+    clients = list(Client.objects.filter(company=company, nip__in=[row['nip'] for row in rows]))
+
+    ClientCounters.objects.bulk_create(
+        [ClientCounters(client=client) for client in clients], batch_size=BULK_BATCH_SIZE
+    )
+    bump_company_counters(company.id, clients_count=len(clients))
+    schedule_client_geocoding(clients)
+    bump_client_map_version(company.id)
+    return clients
+
+
+@transaction.atomic
+def bulk_create_devices(company, rows, actor=None):
+    devices = []
+    for row in rows:
+        data = dict(row)
+        data['owner_id'] = data.pop('owner')
+        data['brand_id'] = data.pop('brand')
+        device = FiscalDevice(**data)
+        device.next_service_date = FiscalDevice.compute_next_service_date(device.last_service_date)
+        devices.append(device)
+
+    FiscalDevice.objects.bulk_create(devices, batch_size=BULK_BATCH_SIZE)
+    devices = list(
+        FiscalDevice.objects.select_related('owner', 'brand').filter(
+            unique_number__in=[device.unique_number for device in devices]
+        )
+    )
+
+    DeviceHistoryEntry.objects.bulk_create([
+        DeviceHistoryEntry(
+            device=device,
+            action_type=DeviceHistoryEntry.ActionType.DEVICE_CREATED,
+            description="Utworzono urządzenie (import zbiorczy).",
+            actor=actor,
+        )
+        for device in devices
+    ], batch_size=BULK_BATCH_SIZE)
+
+    bump_company_counters(company.id, devices_count=len(devices))
+    rebuild_client_counters(company.id, client_ids={device.owner_id for device in devices})
+    bump_chart_version(company.id)
+    return devices
@@ -0,0 +1,157 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models.counters import TicketMonthlyStats
+from .models.devices import FiscalDevice
+from .models.manufacturers import Certification
+from .models.tickets import ServiceTicket
+from .transactions import on_commit_once
+
+CHART_MONTHS = 12
+CHART_EXPIRING_CERTIFICATION_DAYS = 90
+
+TICKET_TYPE_COLORS = {
+    ServiceTicket.TicketType.SERVICE: {'bg': 'rgba(75, 192, 192, 0.7)', 'border': 'rgb(75, 192, 192)'},
+    ServiceTicket.TicketType.REPAIR: {'bg': 'rgba(255, 99, 132, 0.7)', 'border': 'rgb(255, 99, 132)'},
+    ServiceTicket.TicketType.READING: {'bg': 'rgba(54, 162, 235, 0.7)', 'border': 'rgb(54, 162, 235)'},
+    ServiceTicket.TicketType.OTHER: {'bg': 'rgba(201, 203, 207, 0.7)', 'border': 'rgb(201, 203, 207)'},
+}
+
+
+def get_chart_cache_ttl():
+    return int(getattr(settings, 'CHART_CACHE_TTL', 60 * 60))
+
+
+def _version_key(company_id):
+    return f'charts:version:{company_id}'
+
+
+def get_chart_version(company_id):
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        cache.add(_version_key(company_id), 1, timeout=None)
+        version = cache.get(_version_key(company_id)) or 1
+    return version
+
+
+def _incr_chart_version(company_id):
+    try:
+        cache.incr(_version_key(company_id))
+    except ValueError:
+        cache.add(_version_key(company_id), 1, timeout=None)
+
+
+def bump_chart_version(company_id):
+    # Po zatwierdzeniu transakcji - inaczej równoległe żądanie mogłoby zbudować dane z nowym
+    # numerem wersji, ale ze stanu bazy sprzed zmiany.
+    if company_id is None:
+        return
+    on_commit_once(('charts', company_id), lambda: _incr_chart_version(company_id))
+
+
+def _last_months(today, count):
+    # Pierwsze dni ostatnich `count` miesięcy, od najstarszego do bieżącego.
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def _tickets_by_status(company):
+    rows = TicketMonthlyStats.objects.filter(
+        company=company
+    ).values('status').annotate(total=Sum('count')).filter(total__gt=0).order_by('status')
+    labels = dict(ServiceTicket.Status.choices)
+    return {
+        "labels": [labels.get(row['status'], row['status']) for row in rows],
+        "data": [row['total'] for row in rows],
+    }
+
+
+def _workload_over_time(company, today):
+    months = _last_months(today, CHART_MONTHS)
+
+    # Agregat miesięczny - koszt nie zależy od liczby zgłoszeń w historii firmy.
+    rows = TicketMonthlyStats.objects.filter(
+        company=company,
+        month__gte=months[0],
+    ).values('month', 'ticket_type').annotate(total=Sum('count')).order_by()
+
+    monthly_data = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        monthly_data[row['month']][row['ticket_type']] += row['total']
+
+    datasets = []
+    for ticket_type_value, ticket_type_label in ServiceTicket.TicketType.choices:
+        color_set = TICKET_TYPE_COLORS.get(ticket_type_value)
+        datasets.append({
+            "label": ticket_type_label,
+            "data": [monthly_data[month].get(ticket_type_value, 0) for month in months],
+            "backgroundColor": color_set['bg'],
+            "borderColor": color_set['border'],
+        })
+
+    return {
+        "labels": [month.strftime('%B %Y') for month in months],
+        "datasets": datasets,
+    }
+
+
+def _devices_by_status(company):
+    rows = FiscalDevice.objects.filter(
+        owner__company=company
+    ).values('status').annotate(count=Count('id')).order_by('status')
+    labels = dict(FiscalDevice.Status.choices)
+    return {
+        "labels": [labels.get(row['status'], row['status']) for row in rows],
+        "data": [row['count'] for row in rows],
+    }
+
+
+def _expiring_certifications(company, today):
+    certifications = Certification.objects.filter(
+        technician__company=company,
+        expiry_date__lte=today + timedelta(days=CHART_EXPIRING_CERTIFICATION_DAYS),
+        expiry_date__gte=today,
+    ).select_related('technician', 'manufacturer').order_by('expiry_date')
+    return [
+        {
+            "technician": cert.technician.full_name,
+            "manufacturer": cert.manufacturer.name,
+            "certificate_number": cert.certificate_number,
+            "expiry_date": cert.expiry_date.strftime('%Y-%m-%d'),
+        } for cert in certifications
+    ]
+
+
+def build_chart_data(company, today=None):
+    today = today or timezone.localdate()
+    return {
+        "tickets_by_status": _tickets_by_status(company),
+        "workload_over_time": _workload_over_time(company, today),
+        "devices_by_status": _devices_by_status(company),
+        "expiring_certifications": _expiring_certifications(company, today),
+    }
+
+
+def get_chart_data(company):
+    """
+    Dane wykresów pulpitu z cache.
+
+    Klucz zawiera wersję firmy (podbijaną przez sygnały zleceń, urządzeń i certyfikatów)
+    oraz bieżącą datę, bo okno 12 miesięcy i wygasające certyfikaty przesuwają się z dniem.
+    """
+    today = timezone.localdate()
+    key = f'charts:{company.id}:{get_chart_version(company.id)}:{today.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        data = build_chart_data(company, today)
+        cache.set(key, data, get_chart_cache_ttl())
+    return data
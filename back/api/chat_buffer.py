@@ -0,0 +1,110 @@
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+# Górny limit bufora, gdy baza jest niedostępna - najstarsze wiadomości są wtedy porzucane.
+CHAT_BUFFER_MAX_PENDING = 10000
+
+
+def _persist(messages):
+    from .models.chat import Message
+    try:
+        with transaction.atomic():
+            Message.objects.bulk_create(messages, batch_size=500)
+    except IntegrityError:
+        # Jedna błędna wiadomość (np. usunięty nadawca) nie może blokować całej paczki -
+        # zapisujemy pojedynczo i odrzucamy tylko te, których nie da się zapisać.
+        for message in messages:
+            message.pk = None
+            try:
+                with transaction.atomic():
+                    message.save(force_insert=True)
+            except IntegrityError:
+                logger.exception("Chat write buffer dropped message %s", message.uuid)
+
+
+class MessageWriteBuffer:
+    """
+    Bufor zapisu wiadomości czatu w obrębie procesu.
+
+    Wiadomości są zapisywane jednym bulk_create co CHAT_FLUSH_INTERVAL_MS lub po zebraniu
+    CHAT_FLUSH_MAX_MESSAGES. Działa w pętli zdarzeń serwera ASGI, więc nie wymaga blokad.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self._timer = None
+        self._flushing = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'CHAT_FLUSH_INTERVAL_MS', 250) / 1000
+
+    @property
+    def max_messages(self):
+        return getattr(settings, 'CHAT_FLUSH_MAX_MESSAGES', 100)
+
+    def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) > CHAT_BUFFER_MAX_PENDING:
+            dropped = len(self.pending) - CHAT_BUFFER_MAX_PENDING
+            del self.pending[:dropped]
+            logger.error("Chat write buffer overflow, dropped %s messages", dropped)
+
+        if len(self.pending) >= self.max_messages:
+            self._schedule(0)
+        else:
+            self._schedule(self.interval)
+
+    def _schedule(self, delay):
+        if self._timer is not None and not self._timer.done():
+            if delay:
+                # Oczekujący zapis zabierze także tę wiadomość.
+                return
+            self._timer.cancel()
+        self._timer = asyncio.ensure_future(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        if delay:
+            await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        # Jeden zapis naraz - kolejne wywołania czekają na bieżący i zapisują to, co doszło w międzyczasie.
+        while self._flushing is not None:
+            await self._flushing
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        self._flushing = asyncio.get_running_loop().create_future()
+        try:
+            await database_sync_to_async(_persist)(batch)
+        except Exception:
+            logger.exception("Chat write buffer flush failed, %s messages re-queued", len(batch))
+            self.pending[:0] = batch
+            self._schedule(self.interval)
+        finally:
+            self._flushing.set_result(None)
+            self._flushing = None
+
+    def flush_sync(self):
+        # Zamknięcie procesu: pętla zdarzeń już nie działa, zapisujemy resztę synchronicznie.
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            _persist(batch)
+        except Exception:
+            logger.exception("Chat write buffer lost %s messages on shutdown", len(batch))
+
+
+message_buffer = MessageWriteBuffer()
+atexit.register(message_buffer.flush_sync)
@@ -0,0 +1,148 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, BooleanField, Count, ExpressionWrapper, F, IntegerField, Max, Q
+from django.db.models.functions import Cast, Coalesce, Floor
+
+from .models.clients import Client
+
+# Siatka kafelków w stopniach: na poziomie zoom kafelek ma 360 / 2**zoom stopni,
+# a każdy kafelek dzielony jest na MAP_GRID_CELLS x MAP_GRID_CELLS komórek klastrów.
+MAP_GRID_CELLS = 8
+MAP_MAX_ZOOM = 20
+MAP_TILE_CACHE_TTL = 60 * 60
+MAP_MAX_TILES = 256
+# Limit pojedynczych punktów poza klastrowaniem (obszar ekranu przy dużym przybliżeniu).
+MAP_MAX_POINTS = 2000
+
+
+def get_cluster_max_zoom():
+    return int(getattr(settings, 'CLIENT_MAP_CLUSTER_MAX_ZOOM', 13))
+
+
+def _version_key(company_id):
+    return f'clientmap:version:{company_id}'
+
+
+def get_client_map_version(company_id):
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        cache.add(_version_key(company_id), 1, timeout=None)
+        version = cache.get(_version_key(company_id)) or 1
+    return version
+
+
+def bump_client_map_version(company_id):
+    try:
+        cache.incr(_version_key(company_id))
+    except ValueError:
+        cache.add(_version_key(company_id), 1, timeout=None)
+
+
+def geocoded_clients(company_id):
+    return Client.objects.filter(company_id=company_id, latitude__isnull=False, longitude__isnull=False)
+
+
+def client_points(company_id, bbox):
+    return filter_bbox(geocoded_clients(company_id), bbox).annotate(
+        has_open_tickets=ExpressionWrapper(
+            Q(counters__open_tickets_count__gt=0), output_field=BooleanField()
+        ),
+    )
+
+
+def filter_bbox(queryset, bbox):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return queryset.filter(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def _tile_size(zoom):
+    return 360.0 / (2 ** zoom)
+
+
+def count_tiles(bbox, zoom):
+    # Bez budowania listy - przy dużym zoomie i całym świecie kafelków są miliardy.
+    xs, ys = _tile_axes(bbox, zoom)
+    return len(xs) * len(ys)
+
+
+def _tile_axes(bbox, zoom):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    size = _tile_size(zoom)
+    xs = range(math.floor((min_lng + 180) / size), math.floor((max_lng + 180) / size) + 1)
+    ys = range(math.floor((min_lat + 90) / size), math.floor((max_lat + 90) / size) + 1)
+    return xs, ys
+
+
+def _tile_range(bbox, zoom):
+    xs, ys = _tile_axes(bbox, zoom)
+    return [(x, y) for x in xs for y in ys]
+
+
+def _tile_bbox(tile, zoom):
+    size = _tile_size(zoom)
+    x, y = tile
+    return (x * size - 180, y * size - 90, (x + 1) * size - 180, (y + 1) * size - 90)
+
+
+def _compute_tiles(company_id, tiles, zoom):
+    size = _tile_size(zoom)
+    cell = size / MAP_GRID_CELLS
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+    outer = _tile_bbox((min(xs), min(ys)), zoom)[:2] + _tile_bbox((max(xs), max(ys)), zoom)[2:]
+
+    rows = filter_bbox(geocoded_clients(company_id), outer).annotate(
+        cell_x=Cast(Floor((F('longitude') + 180) / cell), IntegerField()),
+        cell_y=Cast(Floor((F('latitude') + 90) / cell), IntegerField()),
+    ).values('cell_x', 'cell_y').annotate(
+        count=Count('id'),
+        latitude=Avg('latitude'),
+        longitude=Avg('longitude'),
+        open_tickets=Max(Coalesce('counters__open_tickets_count', 0)),
+    ).order_by()
+
+    result = {tile: [] for tile in tiles}
+    for row in rows:
+        tile = (row['cell_x'] // MAP_GRID_CELLS, row['cell_y'] // MAP_GRID_CELLS)
+        if tile in result:
+            result[tile].append({
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'count': row['count'],
+                'has_open_tickets': row['open_tickets'] > 0,
+            })
+    return result
+
+
+def get_cluster_tiles(company_id, bbox, zoom):
+    """
+    Zwraca klastry klientów dla kafelków pokrywających bbox.
+
+    Każdy kafelek (firma, wersja, zoom, x, y) jest cache'owany osobno; brakujące kafelki
+    wyliczane są jednym zapytaniem grupującym po komórkach siatki.
+    """
+    version = get_client_map_version(company_id)
+    tiles = _tile_range(bbox, zoom)
+    keys = {tile: f'clientmap:{company_id}:{version}:{zoom}:{tile[0]}:{tile[1]}' for tile in tiles}
+
+    cached = cache.get_many(list(keys.values()))
+    clusters = []
+    missing = []
+    for tile, key in keys.items():
+        if key in cached:
+            clusters.extend(cached[key])
+        else:
+            missing.append(tile)
+
+    if missing:
+        computed = _compute_tiles(company_id, missing, zoom)
+        cache.set_many({keys[tile]: value for tile, value in computed.items()}, MAP_TILE_CACHE_TTL)
+        for value in computed.values():
+            clusters.extend(value)
+
+    return clusters
@@ -2,6 +2,9 @@ import json
 import bleach
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .chat_buffer import message_buffer
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -12,7 +15,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
-        self.technician = await self.get_technician_profile(self.user)
+        context = self.scope.get("company_context")
+        if context is not None:
+            self.technician = context.technician
+        else:
+            self.technician = await self.get_technician_profile(self.user)
         if not self.technician:
             await self.close()
             return
@@ -32,6 +39,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 self.channel_name
             )
+        # Przy zamykaniu serwera połączenia są rozłączane - bufor nie czeka wtedy na kolejny cykl.
+        await message_buffer.flush()
 
     async def receive(self, text_data):
         try:
@@ -45,10 +54,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         clean_content = bleach.clean(message_content, strip=True)
 
-        new_message = await self.save_message(clean_content)
+        if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+            # Najpierw rozgłoszenie, zapis do bazy odbywa się paczkami w tle.
+            new_message = self.build_message(clean_content)
+        else:
+            new_message = await self.save_message(clean_content)
 
         message_payload = {
+            # W trybie write-behind id z bazy jeszcze nie istnieje - klient rozpoznaje wiadomość po uuid.
             'id': new_message.id,
+            'uuid': str(new_message.uuid),
             'sender_id': self.technician.id,
             'sender_name': self.technician.full_name,
             'content': new_message.content,
@@ -63,6 +78,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
         )
 
+        if new_message.pk is None:
+            message_buffer.add(new_message)
+
     async def chat_message(self, event):
         await self.send(text_data=json.dumps(event['message']))
 
@@ -74,6 +92,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Technician.DoesNotExist:
             return None
 
+    def build_message(self, content):
+        from .models.chat import Message
+        return Message(
+            company_id=self.company.id,
+            sender_id=self.technician.id,
+            content=content
+        )
+
     @database_sync_to_async
     def save_message(self, content):
         from .models.chat import Message
@@ -81,4 +107,4 @@ class ChatConsumer(AsyncWebsocketConsumer):
             company=self.company,
             sender=self.technician,
             content=content
-        )
\ No newline at end of file
+        )
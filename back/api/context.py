@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models.users import Company, Technician
+
+CONTEXT_ATTR = '_company_context'
+
+
+@dataclass(frozen=True)
+class CompanyContext:
+    technician: Optional[Technician] = None
+    company: Optional[Company] = None
+
+    @property
+    def role(self):
+        return self.technician.role if self.technician else None
+
+    @property
+    def is_admin(self):
+        return bool(self.technician and self.technician.is_admin)
+
+
+def _resolve(user):
+    if not user or not user.is_authenticated:
+        return CompanyContext()
+
+    technician = Technician.objects.select_related('company').filter(user_id=user.pk).first()
+
+    # Wypełnia cache relacji na obiekcie użytkownika, więc dalsze odwołania
+    # do request.user.technician_profile(.company) nie wykonują już zapytań.
+    user._state.fields_cache['technician_profile'] = technician
+    if technician is not None:
+        technician._state.fields_cache['user'] = user
+
+    return CompanyContext(technician=technician, company=technician.company if technician else None)
+
+
+def get_company_context(request):
+    # Dla requestu DRF kontekst jest zapamiętywany na bazowym HttpRequest,
+    # dzięki czemu middleware, uprawnienia i widoki współdzielą jeden wynik.
+    http_request = getattr(request, '_request', request)
+    user = request.user
+
+    context = getattr(http_request, CONTEXT_ATTR, None)
+    if context is not None and context[0] is user:
+        return context[1]
+
+    resolved = _resolve(user)
+    setattr(http_request, CONTEXT_ATTR, (user, resolved))
+    return resolved
+
+
+# --- Tożsamość dla połączeń WebSocket ------------------------------------------------------------
+# Przy połączeniu WS token JWT weryfikowany jest bez bazy, a użytkownik, serwisant i firma
+# odtwarzane są z krótkotrwałego cache - fala ponownych połączeń po wdrożeniu nie trafia do bazy.
+
+IDENTITY_USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+IDENTITY_TECHNICIAN_FIELDS = ('first_name', 'last_name', 'email', 'role', 'is_active')
+
+
+def _identity_key(user_id):
+    return f'identity:user:{user_id}'
+
+
+def _identity_ttl():
+    return int(getattr(settings, 'WS_IDENTITY_CACHE_TTL', 60))
+
+
+def _dump_identity(user):
+    technician = user.technician_profile if hasattr(user, 'technician_profile') else None
+    data = {
+        'user': {'id': user.pk, **{field: getattr(user, field) for field in IDENTITY_USER_FIELDS}},
+        'technician': None,
+    }
+    if technician is not None:
+        data['technician'] = {
+            'id': technician.pk,
+            'company': {'id': technician.company_id, 'name': technician.company.name},
+            **{field: getattr(technician, field) for field in IDENTITY_TECHNICIAN_FIELDS},
+        }
+    return data
+
+
+def _from_cache(model, values):
+    instance = model(**values)
+    instance._state.adding = False
+    instance._state.db = 'default'
+    return instance
+
+
+def _load_identity(data):
+    user = _from_cache(get_user_model(), data['user'])
+
+    technician_data = data['technician']
+    if technician_data is None:
+        user._state.fields_cache['technician_profile'] = None
+        return user, CompanyContext()
+
+    technician_data = dict(technician_data)
+    company = _from_cache(Company, technician_data.pop('company'))
+    technician = _from_cache(Technician, {**technician_data, 'user_id': user.pk, 'company_id': company.pk})
+    technician._state.fields_cache['company'] = company
+    technician._state.fields_cache['user'] = user
+    user._state.fields_cache['technician_profile'] = technician
+    return user, CompanyContext(technician=technician, company=company)
+
+
+def get_identity(user_id):
+    """Zwraca (użytkownik, CompanyContext) albo None, gdy konto nie istnieje."""
+    data = cache.get(_identity_key(user_id))
+    if data is None:
+        user = get_user_model().objects.select_related('technician_profile__company').filter(pk=user_id).first()
+        if user is None:
+            return None
+        data = _dump_identity(user)
+        cache.set(_identity_key(user_id), data, _identity_ttl())
+    return _load_identity(data)
+
+
+def invalidate_identities(user_ids):
+    cache.delete_many([_identity_key(user_id) for user_id in user_ids if user_id])
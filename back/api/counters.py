@@ -0,0 +1,196 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models.clients import Client
+from .models.counters import CompanyCounters, ClientCounters, TicketMonthlyStats
+from .models.devices import FiscalDevice
+from .models.manufacturers import Certification
+from .models.tickets import ServiceTicket
+
+EXPIRING_CERTIFICATIONS_DAYS = 30
+
+
+def bump_company_counters(company_id, **deltas):
+    # Brak wiersza licznika nie jest błędem - zostanie przeliczony przy pierwszym odczycie
+    # albo podczas nocnej rekoncyliacji.
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if company_id and deltas:
+        CompanyCounters.objects.filter(company_id=company_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+
+def bump_client_counters(client_id, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if client_id and deltas:
+        ClientCounters.objects.filter(client_id=client_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+
+def count_expiring_certifications(company_id):
+    threshold = timezone.now().date() + timedelta(days=EXPIRING_CERTIFICATIONS_DAYS)
+    return Certification.objects.filter(
+        technician__company_id=company_id,
+        expiry_date__lte=threshold
+    ).count()
+
+
+def refresh_certification_counters(company_id):
+    CompanyCounters.objects.filter(company_id=company_id).update(
+        expiring_certifications_count=count_expiring_certifications(company_id),
+        certifications_counted_on=timezone.now().date(),
+    )
+
+
+def get_company_counters(company):
+    counters = CompanyCounters.objects.filter(company=company).first()
+    if counters is None:
+        return rebuild_company_counters(company.id)
+
+    today = timezone.now().date()
+    if counters.certifications_counted_on != today:
+        # "Wygasające w 30 dni" zależy od daty, więc przelicza się raz dziennie, leniwie.
+        counters.expiring_certifications_count = count_expiring_certifications(company.id)
+        counters.certifications_counted_on = today
+        counters.save(update_fields=['expiring_certifications_count', 'certifications_counted_on', 'updated_at'])
+    return counters
+
+
+def get_client_counters(client):
+    counters = ClientCounters.objects.filter(client=client).first()
+    if counters is None:
+        rebuild_client_counters(client.company_id, client_ids=[client.id])
+        counters = ClientCounters.objects.get(client=client)
+    return counters
+
+
+@transaction.atomic
+def rebuild_company_counters(company_id):
+    open_tickets_count = ServiceTicket.objects.filter(
+        client__company_id=company_id,
+        status=ServiceTicket.Status.OPEN
+    ).count()
+
+    counters, _ = CompanyCounters.objects.update_or_create(
+        company_id=company_id,
+        defaults={
+            'open_tickets_count': open_tickets_count,
+            'devices_count': FiscalDevice.objects.filter(owner__company_id=company_id).count(),
+            'clients_count': Client.objects.filter(company_id=company_id).count(),
+            'expiring_certifications_count': count_expiring_certifications(company_id),
+            'certifications_counted_on': timezone.now().date(),
+        }
+    )
+    return counters
+
+
+@transaction.atomic
+def rebuild_client_counters(company_id, client_ids=None):
+    clients = Client.objects.filter(company_id=company_id)
+    if client_ids is not None:
+        clients = clients.filter(id__in=client_ids)
+
+    devices = FiscalDevice.objects.filter(owner__in=clients).values('owner_id').annotate(total=Count('id'))
+    devices_by_client = {row['owner_id']: row['total'] for row in devices}
+
+    tickets = ServiceTicket.objects.filter(client__in=clients).values('client_id').annotate(
+        total=Count('id'),
+        open=Count('id', filter=Q(status=ServiceTicket.Status.OPEN)),
+    )
+    tickets_by_client = {row['client_id']: row for row in tickets}
+
+    rows = []
+    for client_id in clients.values_list('id', flat=True).iterator():
+        ticket_row = tickets_by_client.get(client_id, {})
+        rows.append(ClientCounters(
+            client_id=client_id,
+            devices_count=devices_by_client.get(client_id, 0),
+            tickets_count=ticket_row.get('total', 0),
+            open_tickets_count=ticket_row.get('open', 0),
+        ))
+
+    upsert_kwargs = {
+        'update_conflicts': True,
+        'update_fields': ['devices_count', 'tickets_count', 'open_tickets_count'],
+    }
+    if connection.features.supports_update_conflicts_with_target:
+        upsert_kwargs['unique_fields'] = ['client']
+    ClientCounters.objects.bulk_create(rows, batch_size=1000, **upsert_kwargs)
+
+
+# --- Miesięczny agregat zgłoszeń -----------------------------------------------------------------
+
+def ticket_stats_entry(company_id, created_at, ticket_type, status, resolution, completed_at):
+    """Zwraca (klucz wiersza agregatu, sekundy realizacji lub None) dla jednego zgłoszenia."""
+    key = {
+        'company_id': company_id,
+        'month': timezone.localtime(created_at).date().replace(day=1),
+        'ticket_type': ticket_type,
+        'status': status,
+        'resolution': resolution,
+    }
+    close_seconds = None
+    if status == ServiceTicket.Status.CLOSED and completed_at is not None:
+        close_seconds = max(int((completed_at - created_at).total_seconds()), 0)
+    return key, close_seconds
+
+
+def bump_ticket_stats(key, close_seconds, sign=1):
+    if not key['company_id']:
+        return
+
+    closed = close_seconds is not None
+    updates = {
+        'count': F('count') + sign,
+        'closed_count': F('closed_count') + (sign if closed else 0),
+        'close_seconds_total': F('close_seconds_total') + sign * (close_seconds or 0),
+    }
+    if TicketMonthlyStats.objects.filter(**key).update(**updates):
+        return
+
+    try:
+        with transaction.atomic():
+            TicketMonthlyStats.objects.create(
+                **key,
+                count=sign,
+                closed_count=sign if closed else 0,
+                close_seconds_total=sign * (close_seconds or 0),
+            )
+    except IntegrityError:
+        # Równoległe utworzenie tego samego wiersza - wystarczy ponowić aktualizację.
+        TicketMonthlyStats.objects.filter(**key).update(**updates)
+
+
+@transaction.atomic
+def rebuild_ticket_stats(company_id):
+    is_closed = Q(status=ServiceTicket.Status.CLOSED, completed_at__isnull=False)
+    rows = ServiceTicket.objects.filter(client__company_id=company_id).annotate(
+        month=TruncMonth('created_at', output_field=DateField()),
+    ).values('month', 'ticket_type', 'status', 'resolution').annotate(
+        total=Count('id'),
+        closed=Count('id', filter=is_closed),
+        close_time=Sum(
+            ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField()),
+            filter=is_closed,
+        ),
+    ).order_by()
+
+    TicketMonthlyStats.objects.filter(company_id=company_id).delete()
+    TicketMonthlyStats.objects.bulk_create([
+        TicketMonthlyStats(
+            company_id=company_id,
+            month=row['month'],
+            ticket_type=row['ticket_type'],
+            status=row['status'],
+            resolution=row['resolution'],
+            count=row['total'],
+            closed_count=row['closed'],
+            close_seconds_total=max(int(row['close_time'].total_seconds()), 0) if row['close_time'] else 0,
+        )
+        for row in rows
+    ], batch_size=1000)
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models.manufacturers import Certification
+from .transactions import on_commit_once
+
+
+def get_eligibility_cache_ttl():
+    return int(getattr(settings, 'ELIGIBILITY_CACHE_TTL', 60 * 60))
+
+
+def _version_key(company_id):
+    return f'eligibility:version:{company_id}'
+
+
+def get_eligibility_version(company_id):
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        cache.add(_version_key(company_id), 1, timeout=None)
+        version = cache.get(_version_key(company_id)) or 1
+    return version
+
+
+def _incr_eligibility_version(company_id):
+    try:
+        cache.incr(_version_key(company_id))
+    except ValueError:
+        cache.add(_version_key(company_id), 1, timeout=None)
+
+
+def bump_eligibility_version(company_id):
+    # Po zatwierdzeniu transakcji, żeby mapa nie została odbudowana ze stanu sprzed zmiany.
+    if company_id is None:
+        return
+    on_commit_once(('eligibility', company_id), lambda: _incr_eligibility_version(company_id))
+
+
+def _build_eligibility_map(company_id, today):
+    eligible = defaultdict(set)
+    rows = Certification.objects.filter(
+        technician__company_id=company_id,
+        technician__is_active=True,
+        expiry_date__gte=today,
+    ).values_list('manufacturer_id', 'technician_id')
+    for manufacturer_id, technician_id in rows:
+        eligible[manufacturer_id].add(technician_id)
+    return {manufacturer_id: sorted(technician_ids) for manufacturer_id, technician_ids in eligible.items()}
+
+
+def get_eligibility_map(company_id):
+    """
+    Zwraca {ID producenta: [ID aktywnych serwisantów z ważnym certyfikatem]} dla firmy.
+
+    Mapa jest cache'owana per firma i dzień (ważność certyfikatu zależy od daty), a wersję
+    podbijają zmiany certyfikatów i serwisantów.
+    """
+    today = timezone.localdate()
+    key = f'eligibility:{company_id}:{get_eligibility_version(company_id)}:{today.isoformat()}'
+    eligibility = cache.get(key)
+    if eligibility is None:
+        eligibility = _build_eligibility_map(company_id, today)
+        cache.set(key, eligibility, get_eligibility_cache_ttl())
+    return eligibility
+
+
+def eligible_technician_ids(company_id, manufacturer_id):
+    return get_eligibility_map(company_id).get(manufacturer_id, [])
@@ -0,0 +1,92 @@
+import csv
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models.devices import FiscalDevice
+from .models.tickets import ServiceTicket
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (pole w .values(), nagłówek kolumny, opcjonalna mapa wartość -> etykieta)
+DEVICE_CSV_COLUMNS = [
+    ('id', 'ID', None),
+    ('owner__name', 'Właściciel', None),
+    ('owner__nip', 'NIP właściciela', None),
+    ('brand__name', 'Marka', None),
+    ('model_name', 'Model', None),
+    ('unique_number', 'Numer unikatowy', None),
+    ('serial_number', 'Numer seryjny', None),
+    ('sale_date', 'Data sprzedaży', None),
+    ('last_service_date', 'Data ostatniego przeglądu', None),
+    ('next_service_date', 'Termin następnego przeglądu', None),
+    ('status', 'Status', dict(FiscalDevice.Status.choices)),
+]
+
+TICKET_CSV_COLUMNS = [
+    ('ticket_number', 'Numer zgłoszenia', None),
+    ('title', 'Tytuł', None),
+    ('ticket_type', 'Typ', dict(ServiceTicket.TicketType.choices)),
+    ('status', 'Status', dict(ServiceTicket.Status.choices)),
+    ('resolution', 'Wynik', dict(ServiceTicket.Resolution.choices)),
+    ('created_at', 'Data utworzenia', None),
+    ('scheduled_for', 'Zaplanowano na', None),
+    ('completed_at', 'Data ukończenia', None),
+    ('client__name', 'Klient', None),
+    ('client__nip', 'NIP klienta', None),
+    ('device__brand__name', 'Marka urządzenia', None),
+    ('device__model_name', 'Model urządzenia', None),
+    ('device__unique_number', 'Numer unikatowy urządzenia', None),
+    ('assigned_technician__first_name', 'Serwisant - imię', None),
+    ('assigned_technician__last_name', 'Serwisant - nazwisko', None),
+]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iterate_in_chunks(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    # Stronicowanie po kluczu głównym zamiast .iterator(): sterownik MySQL i tak pobiera
+    # cały wynik do pamięci, a zapytania "pk > ostatni LIMIT n" mają stały koszt.
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values('pk', *fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1]['pk']
+
+
+def _format_value(value, choices):
+    if value is None:
+        return ''
+    if choices is not None:
+        return choices.get(value, value)
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _stream_csv(queryset, columns):
+    writer = csv.writer(_Echo())
+    fields = [field for field, _, _ in columns]
+
+    # BOM, żeby Excel poprawnie rozpoznał UTF-8 (polskie znaki).
+    yield '\ufeff' + writer.writerow([header for _, header, _ in columns])
+    for row in iterate_in_chunks(queryset, fields):
+        yield writer.writerow([_format_value(row[field], choices) for field, _, choices in columns])
+
+
+def streaming_csv_response(queryset, columns, filename):
+    response = StreamingHttpResponse(_stream_csv(queryset, columns), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
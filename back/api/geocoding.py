@@ -0,0 +1,66 @@
+import logging
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from geopy.geocoders import Nominatim
+
+from .models.geocoding import GeocodeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_SLOT_KEY = 'geocoding:nominatim:next_slot'
+
+
+def normalize_address(address):
+    address = re.sub(r'\s*,\s*', ', ', (address or '').strip().lower())
+    return re.sub(r'\s+', ' ', address).strip(' ,')[:255]
+
+
+def get_min_interval():
+    return float(getattr(settings, 'GEOCODING_MIN_INTERVAL_SECONDS', 1))
+
+
+def reserve_nominatim_slot():
+    """
+    Rezerwuje kolejny wolny slot zapytania do Nominatim (polityka: max 1 zapytanie/s).
+
+    Sloty są kolejnymi wielokrotnościami GEOCODING_MIN_INTERVAL_SECONDS; licznik we wspólnym
+    cache daje każdemu workerowi inny slot, więc przy dużej liczbie zadań kolejka rozkłada się
+    w czasie zamiast wielokrotnie ponawiać zajęty slot.
+    """
+    current = math.ceil(time.time() / get_min_interval())
+    cache.add(NOMINATIM_SLOT_KEY, current - 1, timeout=None)
+    slot = cache.incr(NOMINATIM_SLOT_KEY)
+    if slot < current:
+        # Licznik został w przeszłości (brak ruchu) - przesuwamy go do bieżącego slotu.
+        slot = cache.incr(NOMINATIM_SLOT_KEY, current - slot)
+    return slot
+
+
+def seconds_until_slot(slot):
+    return max(0.0, slot * get_min_interval() - time.time())
+
+
+def get_cached_coordinates(address_key):
+    entry = GeocodeCacheEntry.objects.filter(address_key=address_key).first()
+    if entry is None:
+        return None
+    return entry.latitude, entry.longitude
+
+
+def geocode_with_nominatim(address):
+    geolocator = Nominatim(user_agent=getattr(settings, 'NOMINATIM_USER_AGENT', 'FiscalDeviceApp'), timeout=10)
+    location = geolocator.geocode(address)
+    if location:
+        return location.latitude, location.longitude
+    return None, None
+
+
+def store_coordinates(address_key, latitude, longitude):
+    GeocodeCacheEntry.objects.update_or_create(
+        address_key=address_key,
+        defaults={'latitude': latitude, 'longitude': longitude},
+    )
@@ -0,0 +1,469 @@
+import csv
+import io
+import re
+from datetime import date, datetime
+from itertools import islice
+
+from django.db import transaction
+from stdnum.pl import nip as std_nip
+
+from .bulk import BULK_BATCH_SIZE, bulk_create_clients, bulk_create_devices, schedule_client_geocoding
+from .charts import bump_chart_version
+from .client_map import bump_client_map_version
+from .eligibility import bump_eligibility_version
+from .counters import rebuild_client_counters, refresh_certification_counters
+from .models.clients import Client
+from .models.devices import FiscalDevice
+from .models.imports import ImportJob
+from .models.manufacturers import Manufacturer, Certification
+from .models.users import Technician
+from .serializers import ClientBulkItemSerializer, FiscalDeviceBulkItemSerializer, CertificationImportItemSerializer
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_STORED_ERRORS = 500
+CSV_SNIFF_BYTES = 64 * 1024
+
+DATE_INPUT_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d-%m-%Y', '%d/%m/%Y')
+
+# pole -> akceptowane nagłówki kolumn (porównywane bez wielkości liter); nagłówki eksportu CSV też pasują.
+CLIENT_COLUMNS = {
+    'name': ('name', 'nazwa', 'nazwa firmy', 'nazwa klienta', 'klient'),
+    'address': ('address', 'adres'),
+    'nip': ('nip', 'nip klienta'),
+    'regon': ('regon',),
+    'phone_number': ('phone_number', 'telefon', 'numer telefonu'),
+    'email': ('email', 'e-mail', 'adres e-mail'),
+}
+
+DEVICE_COLUMNS = {
+    'owner_nip': ('owner_nip', 'nip właściciela', 'nip klienta', 'nip'),
+    'brand_name': ('brand', 'marka', 'producent'),
+    'model_name': ('model_name', 'model', 'model urządzenia'),
+    'unique_number': ('unique_number', 'numer unikatowy'),
+    'serial_number': ('serial_number', 'numer seryjny'),
+    'sale_date': ('sale_date', 'data sprzedaży'),
+    'last_service_date': ('last_service_date', 'data ostatniego przeglądu'),
+    'status': ('status',),
+    'operating_instructions': ('operating_instructions', 'sposób użytkowania'),
+    'remarks': ('remarks', 'uwagi'),
+}
+
+CERTIFICATION_COLUMNS = {
+    'technician_email': ('technician_email', 'email serwisanta', 'e-mail serwisanta', 'serwisant'),
+    'manufacturer_name': ('manufacturer', 'producent', 'marka'),
+    'certificate_number': ('certificate_number', 'numer certyfikatu', 'numer legitymacji'),
+    'issue_date': ('issue_date', 'data wydania'),
+    'expiry_date': ('expiry_date', 'data ważności'),
+}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class ImportProgress:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_STORED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+
+# --- Odczyt plików -------------------------------------------------------------------------------
+
+def _normalize_header(value):
+    return re.sub(r'\s+', ' ', str(value or '')).strip().lower()
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _iter_csv(fileobj):
+    sample = fileobj.read(CSV_SNIFF_BYTES)
+    fileobj.seek(0)
+    try:
+        sample.decode('utf-8')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Ucięty znak wielobajtowy na końcu próbki nie przesądza o kodowaniu.
+        encoding = 'utf-8-sig' if e.start >= len(sample) - 3 else 'cp1250'
+
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode(encoding, errors='ignore'), delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def _iter_xlsx(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(fileobj, filename, columns, required):
+    """Strumieniowo zwraca (numer wiersza, {pole: wartość}) - plik nigdy nie jest wczytywany w całości."""
+    rows = _iter_xlsx(fileobj) if filename.lower().endswith('.xlsx') else _iter_csv(fileobj)
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError("Plik jest pusty.")
+
+    aliases = {alias: field for field, names in columns.items() for alias in names}
+    mapping = {}
+    for index, title in enumerate(header):
+        field = aliases.get(_normalize_header(title))
+        if field and field not in mapping.values():
+            mapping[index] = field
+
+    missing = [field for field in required if field not in mapping.values()]
+    if missing:
+        expected = ', '.join(columns[field][1] if len(columns[field]) > 1 else field for field in missing)
+        raise ImportFileError(f"Brak wymaganych kolumn: {expected}.")
+
+    for row_number, row in enumerate(rows, start=2):
+        values = {field: _cell(row[index]) if index < len(row) else '' for index, field in mapping.items()}
+        if any(values.values()):
+            yield row_number, values
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# --- Normalizacja wartości -----------------------------------------------------------------------
+
+def _normalize_date(value):
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return value
+
+
+def _clean(values, date_fields=()):
+    data = {}
+    for field, value in values.items():
+        if value == '':
+            continue
+        data[field] = _normalize_date(value) if field in date_fields else value
+    return data
+
+
+def _validate_nip(value):
+    nip = std_nip.compact(value or '')
+    if not std_nip.is_valid(nip):
+        return nip, "Niepoprawny numer NIP."
+    return nip, None
+
+
+def _validate_rows(serializer_class, prepared, progress):
+    """Walidacja pól wiersz po wierszu (bez zapytań do bazy); zwraca listę (numer wiersza, dane)."""
+    valid = []
+    for row_number, data in prepared:
+        serializer = serializer_class(data=data)
+        if serializer.is_valid():
+            valid.append((row_number, serializer.validated_data))
+        else:
+            progress.add_error(row_number, serializer.errors)
+    return valid
+
+
+def _last_per_key(rows, key):
+    # W obrębie paczki obowiązuje ostatnie wystąpienie klucza (jak przy kolejnych aktualizacjach).
+    return list({key(data): (row_number, data) for row_number, data in rows}.values())
+
+
+# --- Importery paczek ----------------------------------------------------------------------------
+
+class ClientImporter:
+    columns = CLIENT_COLUMNS
+    required = ('name', 'address', 'nip')
+    update_fields = ['name', 'address', 'regon', 'phone_number', 'email']
+
+    def __init__(self, company, actor=None):
+        self.company = company
+        self.actor = actor
+
+    def finish(self):
+        bump_client_map_version(self.company.id)
+
+    def import_chunk(self, chunk, progress):
+        prepared = []
+        for row_number, values in chunk:
+            data = _clean(values)
+            data['nip'] = std_nip.compact(data.get('nip', ''))
+            prepared.append((row_number, data))
+
+        rows = _last_per_key(_validate_rows(ClientBulkItemSerializer, prepared, progress), lambda data: data['nip'])
+        if not rows:
+            return
+
+        existing = {
+            client.nip: client
+            for client in Client.objects.filter(company=self.company, nip__in=[data['nip'] for _, data in rows])
+        }
+        to_create = [data for _, data in rows if data['nip'] not in existing]
+        to_update = []
+        moved = []
+        for _, data in rows:
+            client = existing.get(data['nip'])
+            if client is None:
+                continue
+            if data['address'] != client.address:
+                client.latitude = client.longitude = None
+                moved.append(client)
+            # Pusta lub brakująca kolumna nie czyści danych istniejącego klienta.
+            for field in self.update_fields:
+                setattr(client, field, data.get(field, getattr(client, field)))
+            to_update.append(client)
+
+        with transaction.atomic():
+            if to_create:
+                bulk_create_clients(self.company, to_create)
+            if to_update:
+                Client.objects.bulk_update(
+                    to_update, self.update_fields + ['latitude', 'longitude'], batch_size=BULK_BATCH_SIZE
+                )
+                schedule_client_geocoding(moved)
+
+        progress.created += len(to_create)
+        progress.updated += len(to_update)
+
+
+class DeviceImporter:
+    columns = DEVICE_COLUMNS
+    required = ('owner_nip', 'brand_name', 'model_name', 'unique_number', 'serial_number', 'sale_date')
+    date_fields = ('sale_date', 'last_service_date')
+    update_fields = [
+        'owner', 'brand', 'model_name', 'serial_number', 'sale_date', 'last_service_date', 'next_service_date',
+        'status', 'operating_instructions', 'remarks',
+    ]
+
+    def __init__(self, company, actor=None):
+        self.company = company
+        self.actor = actor
+        # Producenci firmy ładowani raz na cały import - wiersze rozwiązywane są w pamięci po nazwie.
+        self.manufacturers = {
+            name.casefold(): pk for pk, name in Manufacturer.objects.filter(company=company).values_list('id', 'name')
+        }
+        self.statuses = {}
+        for value, label in FiscalDevice.Status.choices:
+            self.statuses[value.casefold()] = value
+            self.statuses[label.casefold()] = value
+
+    def finish(self):
+        pass
+
+    def import_chunk(self, chunk, progress):
+        owner_nips = {std_nip.compact(values.get('owner_nip', '')) for _, values in chunk}
+        owners = dict(Client.objects.filter(company=self.company, nip__in=owner_nips).values_list('nip', 'id'))
+
+        prepared = []
+        for row_number, values in chunk:
+            data = _clean(values, self.date_fields)
+            errors = {}
+
+            nip, nip_error = _validate_nip(data.pop('owner_nip', ''))
+            if nip_error:
+                errors['owner_nip'] = [nip_error]
+            elif nip not in owners:
+                errors['owner_nip'] = ["Nie znaleziono klienta o tym numerze NIP."]
+
+            brand_id = self.manufacturers.get(data.pop('brand_name', '').casefold())
+            if brand_id is None:
+                errors['brand'] = ["Nie znaleziono producenta o tej nazwie."]
+
+            if 'status' in data:
+                status = self.statuses.get(data['status'].casefold())
+                if status is None:
+                    errors['status'] = ["Nieznany status urządzenia."]
+                data['status'] = status
+
+            if errors:
+                progress.add_error(row_number, errors)
+                continue
+
+            data['owner'] = owners[nip]
+            data['brand'] = brand_id
+            prepared.append((row_number, data))
+
+        rows = _last_per_key(
+            _validate_rows(FiscalDeviceBulkItemSerializer, prepared, progress), lambda data: data['unique_number']
+        )
+        if not rows:
+            return
+
+        existing = {
+            device.unique_number: device
+            for device in FiscalDevice.objects.select_related('owner').filter(
+                unique_number__in=[data['unique_number'] for _, data in rows]
+            )
+        }
+
+        to_create = []
+        to_update = []
+        affected_owners = set()
+        for row_number, data in rows:
+            device = existing.get(data['unique_number'])
+            if device is None:
+                to_create.append(data)
+                continue
+            if device.owner.company_id != self.company.id:
+                progress.add_error(row_number, {'unique_number': ["Urządzenie o tym numerze należy do innej firmy."]})
+                continue
+
+            affected_owners.update((device.owner_id, data['owner']))
+            device.owner_id = data['owner']
+            device.brand_id = data['brand']
+            for field in ('model_name', 'serial_number', 'sale_date', 'operating_instructions', 'remarks'):
+                setattr(device, field, data.get(field, getattr(device, field)))
+            device.last_service_date = data.get('last_service_date', device.last_service_date)
+            device.status = data.get('status', device.status)
+            device.next_service_date = FiscalDevice.compute_next_service_date(device.last_service_date)
+            to_update.append(device)
+
+        with transaction.atomic():
+            if to_create:
+                bulk_create_devices(self.company, to_create, actor=self.actor)
+            if to_update:
+                FiscalDevice.objects.bulk_update(to_update, self.update_fields, batch_size=BULK_BATCH_SIZE)
+                rebuild_client_counters(self.company.id, client_ids=affected_owners)
+                bump_chart_version(self.company.id)
+
+        progress.created += len(to_create)
+        progress.updated += len(to_update)
+
+
+class CertificationImporter:
+    columns = CERTIFICATION_COLUMNS
+    required = ('technician_email', 'manufacturer_name', 'certificate_number', 'issue_date', 'expiry_date')
+    date_fields = ('issue_date', 'expiry_date')
+    update_fields = ['certificate_number', 'issue_date', 'expiry_date']
+
+    def __init__(self, company, actor=None):
+        self.company = company
+        self.actor = actor
+        self.manufacturers = {
+            name.casefold(): pk for pk, name in Manufacturer.objects.filter(company=company).values_list('id', 'name')
+        }
+        self.technicians = {}
+        for pk, email, user_email in Technician.objects.filter(company=company).values_list('id', 'email', 'user__email'):
+            for address in (email, user_email):
+                if address:
+                    self.technicians.setdefault(address.casefold(), pk)
+
+    def finish(self):
+        refresh_certification_counters(self.company.id)
+        bump_chart_version(self.company.id)
+        bump_eligibility_version(self.company.id)
+
+    def import_chunk(self, chunk, progress):
+        prepared = []
+        for row_number, values in chunk:
+            data = _clean(values, self.date_fields)
+            errors = {}
+
+            technician_id = self.technicians.get(data.pop('technician_email', '').casefold())
+            if technician_id is None:
+                errors['technician'] = ["Nie znaleziono serwisanta o tym adresie e-mail."]
+            manufacturer_id = self.manufacturers.get(data.pop('manufacturer_name', '').casefold())
+            if manufacturer_id is None:
+                errors['manufacturer'] = ["Nie znaleziono producenta o tej nazwie."]
+
+            if errors:
+                progress.add_error(row_number, errors)
+                continue
+
+            data['technician'] = technician_id
+            data['manufacturer'] = manufacturer_id
+            prepared.append((row_number, data))
+
+        rows = _last_per_key(
+            _validate_rows(CertificationImportItemSerializer, prepared, progress),
+            lambda data: (data['technician'], data['manufacturer']),
+        )
+        if not rows:
+            return
+
+        existing = {
+            (certification.technician_id, certification.manufacturer_id): certification
+            for certification in Certification.objects.filter(
+                technician_id__in={data['technician'] for _, data in rows},
+                manufacturer_id__in={data['manufacturer'] for _, data in rows},
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for _, data in rows:
+            certification = existing.get((data['technician'], data['manufacturer']))
+            if certification is None:
+                to_create.append(Certification(
+                    technician_id=data['technician'],
+                    manufacturer_id=data['manufacturer'],
+                    **{field: data[field] for field in self.update_fields},
+                ))
+            else:
+                for field in self.update_fields:
+                    setattr(certification, field, data[field])
+                to_update.append(certification)
+
+        with transaction.atomic():
+            Certification.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+            Certification.objects.bulk_update(to_update, self.update_fields, batch_size=BULK_BATCH_SIZE)
+
+        progress.created += len(to_create)
+        progress.updated += len(to_update)
+
+
+IMPORTERS = {
+    ImportJob.Kind.CLIENTS: ClientImporter,
+    ImportJob.Kind.DEVICES: DeviceImporter,
+    ImportJob.Kind.CERTIFICATIONS: CertificationImporter,
+}
+
+
+def process_import_job(job, progress=None):
+    importer = IMPORTERS[job.kind](job.company, actor=job.requested_by)
+    progress = progress if progress is not None else ImportProgress()
+
+    try:
+        with job.file.open('rb') as fileobj:
+            rows = iter_import_rows(fileobj, job.original_filename or job.file.name, importer.columns, importer.required)
+            for chunk in _chunks(rows, IMPORT_CHUNK_SIZE):
+                importer.import_chunk(chunk, progress)
+                progress.processed += len(chunk)
+                ImportJob.objects.filter(pk=job.pk).update(
+                    processed_rows=progress.processed,
+                    created_count=progress.created,
+                    updated_count=progress.updated,
+                    error_count=progress.error_count,
+                )
+    finally:
+        # Paczki zatwierdzone przed błędem zostają w bazie - cache i liczniki odświeżamy także wtedy.
+        importer.finish()
+    return progress
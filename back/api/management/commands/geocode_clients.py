@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from api.client_map import bump_client_map_version
+from api.geocoding import normalize_address, get_min_interval
+from api.models.clients import Client
+from api.models.geocoding import GeocodeCacheEntry
+from api.tasks import geocode_client_address
+
+
+class Command(BaseCommand):
+    help = "Uzupełnia współrzędne klientów bez lokalizacji (geokodowanie w tle z limitem zapytań)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Tylko klienci wskazanej firmy (ID).")
+        parser.add_argument('--limit', type=int, help="Maksymalna liczba adresów do zlecenia.")
+
+    def handle(self, *args, **options):
+        clients = Client.objects.filter(latitude__isnull=True).exclude(address='')
+        if options['company']:
+            clients = clients.filter(company_id=options['company'])
+
+        # Jeden zapis na unikalny adres - klienci pod tym samym adresem są obsługiwani razem.
+        by_address = {}
+        company_ids = set()
+        for client_id, address, company_id in clients.values_list('id', 'address', 'company_id').iterator():
+            company_ids.add(company_id)
+            key = normalize_address(address)
+            if key:
+                by_address.setdefault(key, (address, []))[1].append(client_id)
+
+        cached = {
+            entry.address_key: entry
+            for entry in GeocodeCacheEntry.objects.filter(address_key__in=list(by_address))
+        }
+
+        updated = 0
+        pending = []
+        for key, (address, client_ids) in by_address.items():
+            entry = cached.get(key)
+            if entry is None:
+                pending.append((address, client_ids))
+            elif entry.found:
+                updated += Client.objects.filter(pk__in=client_ids).update(
+                    latitude=entry.latitude, longitude=entry.longitude
+                )
+
+        if updated:
+            for company_id in company_ids:
+                bump_client_map_version(company_id)
+
+        if options['limit'] is not None:
+            pending = pending[:options['limit']]
+
+        # Zadania rozłożone w czasie zgodnie z limitem Nominatim, żeby nie krążyły w ponowieniach.
+        interval = get_min_interval()
+        for index, (address, client_ids) in enumerate(pending):
+            geocode_client_address.apply_async(args=(client_ids, address), countdown=index * interval)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Uzupełniono z pamięci podręcznej: {updated} klientów. "
+            f"Zlecono geokodowanie {len(pending)} adresów."
+        ))
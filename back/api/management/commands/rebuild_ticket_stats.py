@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.charts import bump_chart_version
+from api.counters import rebuild_ticket_stats
+from api.models.users import Company
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera miesięczny agregat zgłoszeń (TicketMonthlyStats) na podstawie historii zgłoszeń."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Tylko wskazana firma (ID).")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by('id')
+        if options['company']:
+            companies = companies.filter(id=options['company'])
+
+        company_ids = list(companies.values_list('id', flat=True))
+        for company_id in company_ids:
+            rebuild_ticket_stats(company_id)
+            bump_chart_version(company_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono agregat zgłoszeń dla {len(company_ids)} firm."))
@@ -0,0 +1,25 @@
+from .context import get_company_context
+
+
+class LazyCompanyContext:
+    def __init__(self, request):
+        self._request = request
+
+    def __getattr__(self, name):
+        return getattr(get_company_context(self._request), name)
+
+
+class CompanyContextMiddleware:
+    """
+    Udostępnia request.company_context (technician, company, role, is_admin).
+
+    Kontekst jest rozwiązywany dopiero przy pierwszym użyciu - uwierzytelnianie JWT
+    odbywa się w widoku DRF, więc w chwili wywołania middleware użytkownik nie jest jeszcze znany.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.company_context = LazyCompanyContext(request)
+        return self.get_response(request)
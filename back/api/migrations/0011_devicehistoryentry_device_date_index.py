@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_alter_devicehistoryentry_action_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicehistoryentry',
+            index=models.Index(fields=['device', '-event_date'], name='api_history_device_date_idx'),
+        ),
+    ]
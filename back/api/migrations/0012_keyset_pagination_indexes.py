@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_devicehistoryentry_device_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certification',
+            index=models.Index(fields=['-expiry_date', 'id'], name='api_certifi_expiry__56c50c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fiscaldevice',
+            index=models.Index(fields=['-sale_date', 'id'], name='api_fiscald_sale_da_130905_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['company', 'first_name', 'last_name'], name='api_technic_company_8cb135_idx'),
+        ),
+    ]
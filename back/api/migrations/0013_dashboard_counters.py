@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientCounters',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='api.client', verbose_name='Klient')),
+                ('devices_count', models.IntegerField(default=0, verbose_name='Liczba urządzeń')),
+                ('tickets_count', models.IntegerField(default=0, verbose_name='Liczba zgłoszeń')),
+                ('open_tickets_count', models.IntegerField(default=0, verbose_name='Otwarte zgłoszenia')),
+            ],
+            options={
+                'verbose_name': 'Liczniki klienta',
+                'verbose_name_plural': 'Liczniki klientów',
+            },
+        ),
+        migrations.CreateModel(
+            name='CompanyCounters',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='api.company', verbose_name='Firma')),
+                ('open_tickets_count', models.IntegerField(default=0, verbose_name='Otwarte zgłoszenia')),
+                ('devices_count', models.IntegerField(default=0, verbose_name='Liczba urządzeń')),
+                ('clients_count', models.IntegerField(default=0, verbose_name='Liczba klientów')),
+                ('expiring_certifications_count', models.IntegerField(default=0, verbose_name='Certyfikaty wygasające w 30 dni')),
+                ('certifications_counted_on', models.DateField(blank=True, null=True, verbose_name='Data przeliczenia certyfikatów')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Liczniki firmy',
+                'verbose_name_plural': 'Liczniki firm',
+            },
+        ),
+    ]
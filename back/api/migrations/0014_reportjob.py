@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 13:01
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Oczekuje'), ('running', 'W trakcie'), ('done', 'Gotowy'), ('failed', 'Błąd')], default='pending', max_length=20, verbose_name='Status')),
+                ('output_format', models.CharField(default='pdf', max_length=10, verbose_name='Format')),
+                ('parameters', models.JSONField(blank=True, default=dict, verbose_name='Parametry raportu')),
+                ('file', models.FileField(blank=True, null=True, upload_to='reports/%Y/%m/', verbose_name='Plik raportu')),
+                ('error', models.TextField(blank=True, verbose_name='Błąd')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='api.company')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Zlecone przez')),
+            ],
+            options={
+                'verbose_name': 'Zlecenie raportu',
+                'verbose_name_plural': 'Zlecenia raportów',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['company', '-created_at'], name='api_reportj_company_714cd5_idx')],
+            },
+        ),
+    ]
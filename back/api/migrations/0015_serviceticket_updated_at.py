@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceticket',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_serviceticket_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketNumberSequence',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Rok')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Ostatni numer')),
+            ],
+            options={
+                'verbose_name': 'Sekwencja numerów zgłoszeń',
+                'verbose_name_plural': 'Sekwencje numerów zgłoszeń',
+            },
+        ),
+    ]
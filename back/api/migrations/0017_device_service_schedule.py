@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 13:06
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+
+def fill_next_service_date(apps, schema_editor):
+    FiscalDevice = apps.get_model('api', 'FiscalDevice')
+    service_dates = (
+        FiscalDevice.objects.filter(last_service_date__isnull=False)
+        .values_list('last_service_date', flat=True).distinct()
+    )
+    for service_date in service_dates:
+        FiscalDevice.objects.filter(last_service_date=service_date).update(
+            next_service_date=service_date + relativedelta(years=2)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_ticketnumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fiscaldevice',
+            name='last_reminder_sent',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Ostatnie przypomnienie'),
+        ),
+        migrations.AddField(
+            model_name='fiscaldevice',
+            name='next_service_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Termin następnego przeglądu'),
+        ),
+        migrations.AddField(
+            model_name='fiscaldevice',
+            name='reminder_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba przypomnień'),
+        ),
+        migrations.AddIndex(
+            model_name='fiscaldevice',
+            index=models.Index(fields=['next_service_date'], name='api_device_next_service_idx'),
+        ),
+        migrations.RunPython(fill_next_service_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_device_service_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_key', models.CharField(max_length=255, unique=True, verbose_name='Znormalizowany adres')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Szerokość geograficzna')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Długość geograficzna')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Wynik geokodowania',
+                'verbose_name_plural': 'Wyniki geokodowania',
+            },
+        ),
+    ]
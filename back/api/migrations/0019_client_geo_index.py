@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['company', 'latitude', 'longitude'], name='api_client_company_geo_idx'),
+        ),
+    ]
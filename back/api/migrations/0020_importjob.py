@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 13:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_client_geo_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('clients', 'Klienci'), ('devices', 'Urządzenia'), ('certifications', 'Certyfikaty')], max_length=20, verbose_name='Rodzaj danych')),
+                ('status', models.CharField(choices=[('pending', 'Oczekuje'), ('running', 'W trakcie'), ('done', 'Zakończony'), ('failed', 'Błąd')], default='pending', max_length=20, verbose_name='Status')),
+                ('file', models.FileField(upload_to='imports/%Y/%m/', verbose_name='Plik importu')),
+                ('original_filename', models.CharField(blank=True, max_length=255, verbose_name='Nazwa pliku')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Przetworzone wiersze')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Utworzone rekordy')),
+                ('updated_count', models.PositiveIntegerField(default=0, verbose_name='Zaktualizowane rekordy')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Wiersze z błędami')),
+                ('row_errors', models.JSONField(blank=True, default=list, verbose_name='Błędy wierszy')),
+                ('error', models.TextField(blank=True, verbose_name='Błąd')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='api.company')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Zlecone przez')),
+            ],
+            options={
+                'verbose_name': 'Import danych',
+                'verbose_name_plural': 'Importy danych',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['company', '-created_at'], name='api_importj_company_a32925_idx')],
+            },
+        ),
+    ]
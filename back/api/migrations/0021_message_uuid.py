@@ -0,0 +1,43 @@
+import uuid
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_message_uuids(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    batch = []
+    for message in Message.objects.only('id').iterator(chunk_size=2000):
+        message.uuid = uuid.uuid4()
+        batch.append(message)
+        if len(batch) >= 2000:
+            Message.objects.bulk_update(batch, ['uuid'])
+            batch = []
+    if batch:
+        Message.objects.bulk_update(batch, ['uuid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_message_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
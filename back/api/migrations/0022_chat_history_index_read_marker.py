@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 13:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_message_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['company', 'timestamp', 'id'], name='api_message_company_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatreadmarker',
+            name='last_read_message',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message'),
+        ),
+        migrations.AddField(
+            model_name='chatreadmarker',
+            name='technician',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_marker', to='api.technician'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 13:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_ticket_stats(apps, schema_editor):
+    ServiceTicket = apps.get_model('api', 'ServiceTicket')
+    TicketMonthlyStats = apps.get_model('api', 'TicketMonthlyStats')
+
+    is_closed = Q(status='closed', completed_at__isnull=False)
+    rows = ServiceTicket.objects.annotate(
+        month=TruncMonth('created_at', output_field=DateField()),
+    ).values('client__company_id', 'month', 'ticket_type', 'status', 'resolution').annotate(
+        total=Count('id'),
+        closed=Count('id', filter=is_closed),
+        close_time=Sum(
+            ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField()),
+            filter=is_closed,
+        ),
+    ).order_by()
+
+    TicketMonthlyStats.objects.bulk_create([
+        TicketMonthlyStats(
+            company_id=row['client__company_id'],
+            month=row['month'],
+            ticket_type=row['ticket_type'],
+            status=row['status'],
+            resolution=row['resolution'],
+            count=row['total'],
+            closed_count=row['closed'],
+            close_seconds_total=max(int(row['close_time'].total_seconds()), 0) if row['close_time'] else 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_chat_history_index_read_marker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketMonthlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Miesiąc')),
+                ('ticket_type', models.CharField(max_length=20, verbose_name='Typ zgłoszenia')),
+                ('status', models.CharField(max_length=20, verbose_name='Status')),
+                ('resolution', models.CharField(max_length=20, verbose_name='Wynik rozwiązania')),
+                ('count', models.IntegerField(default=0, verbose_name='Liczba zgłoszeń')),
+                ('closed_count', models.IntegerField(default=0, verbose_name='Zamknięte z datą ukończenia')),
+                ('close_seconds_total', models.BigIntegerField(default=0, verbose_name='Suma czasu realizacji [s]')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_stats', to='api.company', verbose_name='Firma')),
+            ],
+            options={
+                'verbose_name': 'Statystyka miesięczna zgłoszeń',
+                'verbose_name_plural': 'Statystyki miesięczne zgłoszeń',
+                'constraints': [models.UniqueConstraint(fields=('company', 'month', 'ticket_type', 'status', 'resolution'), name='unique_ticket_monthly_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_ticket_stats, migrations.RunPython.noop),
+    ]
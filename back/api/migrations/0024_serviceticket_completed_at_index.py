@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_ticketmonthlystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceticket',
+            index=models.Index(fields=['completed_at'], name='api_service_complet_ff2492_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_serviceticket_completed_at_index'),
+    ]
+
+    # Nowy indeks najpierw: MySQL nie pozwala usunąć jedynego indeksu kolumny klucza obcego.
+    operations = [
+        migrations.AddIndex(
+            model_name='certification',
+            index=models.Index(fields=['manufacturer', 'expiry_date'], name='api_cert_manufacturer_exp_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='certification',
+            name='api_certifi_manufac_160d10_idx',
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_client_counters(apps, schema_editor):
+    Client = apps.get_model('api', 'Client')
+    ClientCounters = apps.get_model('api', 'ClientCounters')
+    FiscalDevice = apps.get_model('api', 'FiscalDevice')
+    ServiceTicket = apps.get_model('api', 'ServiceTicket')
+
+    # Klienci sprzed wprowadzenia liczników nie mają jeszcze swojego wiersza.
+    clients = Client.objects.filter(counters__isnull=True)
+
+    devices = FiscalDevice.objects.filter(owner__in=clients).values('owner_id').annotate(total=Count('id')).order_by()
+    devices_by_client = {row['owner_id']: row['total'] for row in devices}
+
+    tickets = ServiceTicket.objects.filter(client__in=clients).values('client_id').annotate(
+        total=Count('id'),
+        open=Count('id', filter=Q(status='open')),
+    ).order_by()
+    tickets_by_client = {row['client_id']: row for row in tickets}
+
+    rows = []
+    for client_id in clients.values_list('id', flat=True).iterator():
+        ticket_row = tickets_by_client.get(client_id, {})
+        rows.append(ClientCounters(
+            client_id=client_id,
+            devices_count=devices_by_client.get(client_id, 0),
+            tickets_count=ticket_row.get('total', 0),
+            open_tickets_count=ticket_row.get('open', 0),
+        ))
+    ClientCounters.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_certification_manufacturer_expiry_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_client_counters, migrations.RunPython.noop),
+    ]
@@ -2,15 +2,23 @@ from .users import CustomUser, Company, Technician
 from .clients import Client
 from .manufacturers import Manufacturer, Certification
 from .devices import FiscalDevice
-from .tickets import ServiceTicket
+from .tickets import ServiceTicket, TicketNumberSequence
 from .billing import Order, ActivationCode
-from .chat import Message
+from .chat import Message, ChatReadMarker
+from .counters import CompanyCounters, ClientCounters, TicketMonthlyStats
+from .reports import ReportJob
+from .geocoding import GeocodeCacheEntry
+from .imports import ImportJob
 
 __all__ = [
     'CustomUser', 'Company', 'Technician',
     'Client',
     'Manufacturer', 'Certification',
     'FiscalDevice',
-    'ServiceTicket',
-    'Order', 'ActivationCode', 'Message'
+    'ServiceTicket', 'TicketNumberSequence',
+    'Order', 'ActivationCode', 'Message', 'ChatReadMarker',
+    'CompanyCounters', 'ClientCounters', 'TicketMonthlyStats',
+    'ReportJob',
+    'GeocodeCacheEntry',
+    'ImportJob',
 ]
\ No newline at end of file
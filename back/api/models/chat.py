@@ -1,14 +1,34 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
 from .users import Technician, Company  # Poprawny import dla Twojej struktury
 
 class Message(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(Technician, on_delete=models.CASCADE, related_name="sent_messages")
+    # Identyfikator nadawany przy rozgłoszeniu - wiadomość trafia do bazy dopiero przy zapisie paczki.
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default zamiast auto_now_add: bulk_create nadpisałby czas nadania czasem zapisu paczki.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['company', 'timestamp', 'id'], name='api_message_company_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.sender} in {self.company} at {self.timestamp}"
+
+
+class ChatReadMarker(models.Model):
+    """Ostatnia przeczytana wiadomość serwisanta - po ponownym połączeniu pobierane są tylko nowsze."""
+    technician = models.OneToOneField(Technician, on_delete=models.CASCADE, related_name="chat_read_marker")
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, related_name="+")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Message from {self.sender} in {self.company} at {self.timestamp}"
\ No newline at end of file
+        return f"Read marker of {self.technician}"
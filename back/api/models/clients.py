@@ -36,4 +36,5 @@ class Client(models.Model):
         indexes = [
             models.Index(fields=['company', 'nip']),
             models.Index(fields=['company', 'name']),
+            models.Index(fields=['company', 'latitude', 'longitude'], name='api_client_company_geo_idx'),
         ]
@@ -0,0 +1,72 @@
+from django.db import models
+from .users import Company
+from .clients import Client
+
+
+class CompanyCounters(models.Model):
+    company = models.OneToOneField(
+        Company, on_delete=models.CASCADE, primary_key=True, related_name='counters', verbose_name="Firma"
+    )
+    open_tickets_count = models.IntegerField(default=0, verbose_name="Otwarte zgłoszenia")
+    devices_count = models.IntegerField(default=0, verbose_name="Liczba urządzeń")
+    clients_count = models.IntegerField(default=0, verbose_name="Liczba klientów")
+    expiring_certifications_count = models.IntegerField(default=0, verbose_name="Certyfikaty wygasające w 30 dni")
+    certifications_counted_on = models.DateField(null=True, blank=True, verbose_name="Data przeliczenia certyfikatów")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Liczniki firmy {self.company_id}"
+
+    class Meta:
+        verbose_name = "Liczniki firmy"
+        verbose_name_plural = "Liczniki firm"
+
+
+class ClientCounters(models.Model):
+    client = models.OneToOneField(
+        Client, on_delete=models.CASCADE, primary_key=True, related_name='counters', verbose_name="Klient"
+    )
+    devices_count = models.IntegerField(default=0, verbose_name="Liczba urządzeń")
+    tickets_count = models.IntegerField(default=0, verbose_name="Liczba zgłoszeń")
+    open_tickets_count = models.IntegerField(default=0, verbose_name="Otwarte zgłoszenia")
+
+    def __str__(self):
+        return f"Liczniki klienta {self.client_id}"
+
+    class Meta:
+        verbose_name = "Liczniki klienta"
+        verbose_name_plural = "Liczniki klientów"
+
+
+class TicketMonthlyStats(models.Model):
+    """
+    Agregat zgłoszeń firmy w miesiącu utworzenia, w podziale na typ, status i wynik.
+
+    Utrzymywany przyrostowo przez sygnały zgłoszeń; czas realizacji przechowywany jest jako suma
+    sekund zamkniętych zgłoszeń, więc średnią można aktualizować bez ponownego liczenia historii.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='ticket_stats', verbose_name="Firma")
+    month = models.DateField(verbose_name="Miesiąc")
+    ticket_type = models.CharField(max_length=20, verbose_name="Typ zgłoszenia")
+    status = models.CharField(max_length=20, verbose_name="Status")
+    resolution = models.CharField(max_length=20, verbose_name="Wynik rozwiązania")
+    count = models.IntegerField(default=0, verbose_name="Liczba zgłoszeń")
+    closed_count = models.IntegerField(default=0, verbose_name="Zamknięte z datą ukończenia")
+    close_seconds_total = models.BigIntegerField(default=0, verbose_name="Suma czasu realizacji [s]")
+
+    @property
+    def mean_close_seconds(self):
+        return self.close_seconds_total / self.closed_count if self.closed_count else None
+
+    def __str__(self):
+        return f"{self.company_id} {self.month:%Y-%m} {self.ticket_type}/{self.status}/{self.resolution}: {self.count}"
+
+    class Meta:
+        verbose_name = "Statystyka miesięczna zgłoszeń"
+        verbose_name_plural = "Statystyki miesięczne zgłoszeń"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'month', 'ticket_type', 'status', 'resolution'],
+                name='unique_ticket_monthly_stats',
+            ),
+        ]
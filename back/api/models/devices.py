@@ -1,3 +1,4 @@
+from dateutil.relativedelta import relativedelta
 from django.db import models
 from .clients import Client
 from .manufacturers import Manufacturer
@@ -12,12 +13,18 @@ class FiscalDevice(models.Model):
         SERVICED = 'serviced', 'W serwisie'
         DECOMMISSIONED = 'decommissioned', 'Wycofana'
 
+    # Obowiązkowy przegląd techniczny kasy fiskalnej co 2 lata.
+    SERVICE_INTERVAL = relativedelta(years=2)
+
     brand = models.ForeignKey(Manufacturer, on_delete=models.PROTECT, verbose_name="Marka/Producent")
     model_name = models.CharField(max_length=100, verbose_name="Model urządzenia")
     unique_number = models.CharField(max_length=100, unique=True, db_index=True, verbose_name="Numer unikatowy")
     serial_number = models.CharField(max_length=100, verbose_name="Numer seryjny")
     sale_date = models.DateField(verbose_name="Data sprzedaży")
     last_service_date = models.DateField(null=True, blank=True, verbose_name="Data ostatniego przeglądu")
+    next_service_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Termin następnego przeglądu")
+    last_reminder_sent = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Ostatnie przypomnienie")
+    reminder_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Liczba przypomnień")
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.ACTIVE, verbose_name="Status")
     operating_instructions = models.TextField(blank=True, verbose_name="Sposób użytkowania")
     remarks = models.TextField(blank=True, verbose_name="Uwagi")
@@ -26,6 +33,19 @@ class FiscalDevice(models.Model):
     def __str__(self):
         return f"{self.brand.name} {self.model_name} (SN: {self.serial_number})"
 
+    @classmethod
+    def compute_next_service_date(cls, last_service_date):
+        if last_service_date is None:
+            return None
+        return last_service_date + cls.SERVICE_INTERVAL
+
+    def save(self, *args, **kwargs):
+        self.next_service_date = self.compute_next_service_date(self.last_service_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'last_service_date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'next_service_date'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Urządzenie fiskalne"
         verbose_name_plural = "Urządzenia fiskalne"
@@ -33,6 +53,8 @@ class FiscalDevice(models.Model):
         indexes = [
             models.Index(fields=['owner']),
             models.Index(fields=['serial_number']),
+            models.Index(fields=['-sale_date', 'id']),
+            models.Index(fields=['next_service_date'], name='api_device_next_service_idx'),
         ]
 
 
@@ -79,6 +101,9 @@ class DeviceHistoryEntry(models.Model):
         verbose_name = "Wpis historii urządzenia"
         verbose_name_plural = "Wpisy historii urządzeń"
         ordering = ['-event_date']  # Najnowsze wpisy na górze
+        indexes = [
+            models.Index(fields=['device', '-event_date'], name='api_history_device_date_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.event_date.strftime('%Y-%m-%d %H:%M')}] {self.device}: {self.get_action_type_display()}"
\ No newline at end of file
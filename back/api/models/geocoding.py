@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class GeocodeCacheEntry(models.Model):
+    address_key = models.CharField(max_length=255, unique=True, verbose_name="Znormalizowany adres")
+    latitude = models.FloatField(null=True, blank=True, verbose_name="Szerokość geograficzna")
+    longitude = models.FloatField(null=True, blank=True, verbose_name="Długość geograficzna")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def found(self):
+        return self.latitude is not None and self.longitude is not None
+
+    def __str__(self):
+        return self.address_key
+
+    class Meta:
+        verbose_name = "Wynik geokodowania"
+        verbose_name_plural = "Wyniki geokodowania"
@@ -0,0 +1,48 @@
+import uuid
+from django.db import models
+from django.conf import settings
+from .users import Company
+
+
+class ImportJob(models.Model):
+
+    class Kind(models.TextChoices):
+        CLIENTS = 'clients', 'Klienci'
+        DEVICES = 'devices', 'Urządzenia'
+        CERTIFICATIONS = 'certifications', 'Certyfikaty'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Oczekuje'
+        RUNNING = 'running', 'W trakcie'
+        DONE = 'done', 'Zakończony'
+        FAILED = 'failed', 'Błąd'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='import_jobs')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Zlecone przez"
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name="Rodzaj danych")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    file = models.FileField(upload_to='imports/%Y/%m/', verbose_name="Plik importu")
+    original_filename = models.CharField(max_length=255, blank=True, verbose_name="Nazwa pliku")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="Przetworzone wiersze")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="Utworzone rekordy")
+    updated_count = models.PositiveIntegerField(default=0, verbose_name="Zaktualizowane rekordy")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="Wiersze z błędami")
+    row_errors = models.JSONField(default=list, blank=True, verbose_name="Błędy wierszy")
+    error = models.TextField(blank=True, verbose_name="Błąd")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.get_kind_display()} {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Import danych"
+        verbose_name_plural = "Importy danych"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at']),
+        ]
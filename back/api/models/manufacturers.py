@@ -38,6 +38,7 @@ class Certification(models.Model):
             models.UniqueConstraint(fields=['technician', 'manufacturer'], name='unique_technician_manufacturer_certification')
         ]
         indexes = [
-            models.Index(fields=['manufacturer']),
+            models.Index(fields=['manufacturer', 'expiry_date'], name='api_cert_manufacturer_exp_idx'),
             models.Index(fields=['technician']),
+            models.Index(fields=['-expiry_date', 'id']),
         ]
@@ -0,0 +1,38 @@
+import uuid
+from django.db import models
+from django.conf import settings
+from .users import Company
+
+
+class ReportJob(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Oczekuje'
+        RUNNING = 'running', 'W trakcie'
+        DONE = 'done', 'Gotowy'
+        FAILED = 'failed', 'Błąd'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Zlecone przez"
+    )
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    output_format = models.CharField(max_length=10, default='pdf', verbose_name="Format")
+    parameters = models.JSONField(default=dict, blank=True, verbose_name="Parametry raportu")
+    file = models.FileField(upload_to='reports/%Y/%m/', null=True, blank=True, verbose_name="Plik raportu")
+    error = models.TextField(blank=True, verbose_name="Błąd")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Raport {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Zlecenie raportu"
+        verbose_name_plural = "Zlecenia raportów"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at']),
+        ]
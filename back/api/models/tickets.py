@@ -1,5 +1,6 @@
 from datetime import date
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Length
 
 from .clients import Client
 from .devices import FiscalDevice
@@ -39,6 +40,7 @@ class ServiceTicket(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     resolution_notes = models.TextField(blank=True, verbose_name="Notatki z wykonania / Rozwiązanie")
     resolution = models.CharField(
         max_length=20,
@@ -47,28 +49,55 @@ class ServiceTicket(models.Model):
         verbose_name="Wynik rozwiązania"
     )
 
+    # Wartości zapamiętywane przy odczycie z bazy - sygnały porównują je z bieżącymi
+    # zamiast pobierać poprzedni stan dodatkowym SELECT-em.
+    tracked_fields = ('status', 'device_id', 'client_id', 'ticket_type', 'resolution', 'completed_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _snapshot_tracked_fields(self):
+        self._loaded_values = {
+            field: self.__dict__[field] for field in self.tracked_fields if field in self.__dict__
+        }
+
+    def get_loaded_value(self, field):
+        return getattr(self, '_loaded_values', {}).get(field)
+
+    def has_loaded_values(self):
+        return set(getattr(self, '_loaded_values', {})) == set(self.tracked_fields)
+
     def save(self, *args, **kwargs):
-        if not self.ticket_number:
-            self.ticket_number = self._generate_ticket_number()
-        super().save(*args, **kwargs)
+        if self.ticket_number:
+            super().save(*args, **kwargs)
+        else:
+            # Rezerwacja numeru i zapis zgłoszenia w jednej transakcji - nieudany INSERT
+            # wycofuje także licznik, więc numeracja pozostaje ciągła.
+            try:
+                with transaction.atomic():
+                    self.ticket_number = self._generate_ticket_number()
+                    super().save(*args, **kwargs)
+            except Exception:
+                self.ticket_number = ''
+                raise
+        self._snapshot_tracked_fields()
 
     @staticmethod
-    def _generate_ticket_number():
-        current_year = date.today().year
-        with transaction.atomic():
-            last_ticket = ServiceTicket.objects.select_for_update().filter(
-                ticket_number__startswith=f"ZGL-{current_year}-"
-            ).order_by('ticket_number').last()
+    def format_ticket_number(year, seq):
+        return f"ZGL-{year}-{seq:04d}"
 
-            last_seq = 0
-            if last_ticket:
-                try:
-                    last_seq = int(last_ticket.ticket_number.split('-')[-1])
-                except (ValueError, IndexError):
-                    last_seq = 0
+    @classmethod
+    def _generate_ticket_number(cls):
+        return cls.reserve_ticket_numbers(1)[0]
 
-            new_seq = last_seq + 1
-            return f"ZGL-{current_year}-{new_seq:04d}"
+    @classmethod
+    def reserve_ticket_numbers(cls, count):
+        current_year = date.today().year
+        numbers = TicketNumberSequence.reserve(current_year, count)
+        return [cls.format_ticket_number(current_year, seq) for seq in numbers]
 
     def __str__(self):
         return f"{self.ticket_number}: {self.title}"
@@ -80,4 +109,50 @@ class ServiceTicket(models.Model):
         indexes = [
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['completed_at']),
         ]
+
+
+class TicketNumberSequence(models.Model):
+    year = models.PositiveIntegerField(primary_key=True, verbose_name="Rok")
+    last_value = models.PositiveIntegerField(default=0, verbose_name="Ostatni numer")
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, year, count=1):
+        # Blokada obejmuje tylko jeden wiersz roku i trwa do końca transakcji wywołującej,
+        # więc numery pozostają ciągłe także przy wycofaniu zapisu zgłoszenia.
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(year=year).first()
+            if sequence is None:
+                try:
+                    with transaction.atomic():
+                        sequence = cls.objects.create(year=year, last_value=cls._initial_value(year))
+                except IntegrityError:
+                    # Wiersz roku utworzyła równoległa transakcja.
+                    sequence = cls.objects.select_for_update().get(year=year)
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+        return range(sequence.last_value - count + 1, sequence.last_value + 1)
+
+    @staticmethod
+    def _initial_value(year):
+        # Jednorazowe przejęcie numeracji z istniejących zgłoszeń danego roku.
+        last_ticket = ServiceTicket.objects.filter(
+            ticket_number__startswith=f"ZGL-{year}-"
+        ).annotate(
+            number_length=Length('ticket_number')
+        ).order_by('-number_length', '-ticket_number').values_list('ticket_number', flat=True).first()
+
+        if not last_ticket:
+            return 0
+        try:
+            return int(last_ticket.split('-')[-1])
+        except (ValueError, IndexError):
+            return 0
+
+    class Meta:
+        verbose_name = "Sekwencja numerów zgłoszeń"
+        verbose_name_plural = "Sekwencje numerów zgłoszeń"
@@ -59,4 +59,5 @@ class Technician(models.Model):
         verbose_name_plural = "Serwisanci"
         indexes = [
             models.Index(fields=['company']),
+            models.Index(fields=['company', 'first_name', 'last_name']),
         ]
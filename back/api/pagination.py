@@ -0,0 +1,179 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginacja typu keyset ("seek") po złożonym, jednoznacznym porządku.
+
+    Kursor koduje wartości pól sortowania ostatniego (lub pierwszego) wiersza strony,
+    więc kolejna strona to zapytanie `WHERE (a, id) > (x, y) ... LIMIT n` obsługiwane
+    przez indeks - głębokie strony kosztują tyle samo co pierwsza.
+
+    Porządek pochodzi z atrybutu `cursor_ordering` widoku (domyślnie `ordering` klasy)
+    i musi kończyć się polem unikalnym. Parametr `ordering` z OrderingFilter nie jest
+    brany pod uwagę w trybie stronicowania.
+
+    Jeśli `always_paginate` jest wyłączone, stronicowanie włącza się dopiero, gdy klient
+    przekaże `cursor` lub `page_size` - bez nich endpoint zwraca pełną listę jak dotąd.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-pk',)
+    always_paginate = False
+    invalid_cursor_message = 'Nieprawidłowy kursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.always_paginate and not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+
+        position, reverse = self.get_position(request, queryset)
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_position(self, request, queryset):
+        # Punkt startowy strony; podklasy mogą wyznaczać go inaczej niż z kursora (np. z kotwicy).
+        return self.decode_cursor(request)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        return tuple(ordering)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._build_link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _build_link(self, instance, reverse):
+        position = [self._serialize(self._get_value(instance, field)) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip('-')
+
+    @classmethod
+    def _invert(cls, ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @classmethod
+    def _get_value(cls, instance, field):
+        value = instance
+        for attr in cls._field_name(field).split('__'):
+            value = getattr(value, attr)
+        return value
+
+    @staticmethod
+    def _serialize(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (Decimal, UUID)):
+            return str(value)
+        return value
+
+    @classmethod
+    def _seek_filter(cls, ordering, position):
+        # (a, b, c) > (x, y, z)  <=>  a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND c > z)
+        condition = Q()
+        equal_prefix = Q()
+        for field, value in zip(ordering, position):
+            name = cls._field_name(field)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return condition
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, OuterRef, Subquery
+from django.template.loader import get_template
+
+from .models.devices import FiscalDevice, DeviceHistoryEntry
+from .models.tickets import ServiceTicket
+
+logger = logging.getLogger(__name__)
+
+DEVICE_REPORT_TEMPLATE = 'device_report.html'
+
+# Pola widoczne w raporcie PDF - ich zmiana musi unieważnić zapisany plik.
+DEVICE_FINGERPRINT_FIELDS = (
+    'id', 'model_name', 'unique_number', 'serial_number', 'sale_date', 'last_service_date', 'status',
+    'operating_instructions', 'remarks', 'brand__name', 'owner__name', 'owner__nip', 'owner__address',
+)
+
+
+def get_cache_dir():
+    return Path(getattr(settings, 'DEVICE_PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'cache' / 'device_pdf'))
+
+
+def get_cache_max_bytes():
+    return int(getattr(settings, 'DEVICE_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+
+@lru_cache(maxsize=None)
+def get_template_version():
+    template = get_template(DEVICE_REPORT_TEMPLATE)
+    source = template.template.source
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def get_device_version(device_id, company):
+    # Jedno zapytanie: wiersz urządzenia + najnowszy wpis historii + znaczniki zleceń.
+    tickets = ServiceTicket.objects.filter(device=OuterRef('pk')).order_by()
+    history = DeviceHistoryEntry.objects.filter(device=OuterRef('pk'))
+
+    row = FiscalDevice.objects.filter(id=device_id, owner__company=company).values(
+        *DEVICE_FINGERPRINT_FIELDS
+    ).annotate(
+        last_history_id=Subquery(history.order_by('-id').values('id')[:1]),
+        tickets_updated_at=Subquery(tickets.order_by('-updated_at').values('updated_at')[:1]),
+        tickets_completed_at=Subquery(
+            tickets.filter(completed_at__isnull=False).order_by('-completed_at').values('completed_at')[:1]
+        ),
+        tickets_total=Subquery(tickets.values('device').annotate(total=Count('id')).values('total')[:1]),
+    ).first()
+
+    if row is None:
+        return None
+
+    row['template_version'] = get_template_version()
+    payload = json.dumps(row, cls=DjangoJSONEncoder, sort_keys=True)
+    row['fingerprint'] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return row
+
+
+def _cache_path(fingerprint):
+    return get_cache_dir() / f"{fingerprint}.pdf"
+
+
+def read_cached_pdf(fingerprint):
+    path = _cache_path(fingerprint)
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)  # mtime jako znacznik ostatniego użycia (LRU)
+    except OSError:
+        pass
+    return content
+
+
+def store_cached_pdf(fingerprint, content):
+    cache_dir = get_cache_dir()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as tmp:
+            tmp.write(content)
+        os.replace(tmp.name, _cache_path(fingerprint))
+        evict_cached_pdfs()
+    except OSError:
+        logger.exception("store_cached_pdf: failed to write cache entry %s", fingerprint)
+
+
+def evict_cached_pdfs():
+    max_bytes = get_cache_max_bytes()
+    entries = []
+    total = 0
+    for entry in os.scandir(get_cache_dir()):
+        if entry.is_file() and entry.name.endswith('.pdf'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
@@ -0,0 +1,67 @@
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from django.utils import timezone
+from weasyprint import HTML
+
+from .models.devices import FiscalDevice, DeviceHistoryEntry
+from .models.tickets import ServiceTicket
+
+
+def filter_report_devices(company, params):
+    queryset = FiscalDevice.objects.filter(owner__company=company)
+
+    if params.get('clients'):
+        queryset = queryset.filter(owner_id__in=params['clients'])
+    if params.get('devices'):
+        queryset = queryset.filter(id__in=params['devices'])
+    if params.get('device_brands'):
+        queryset = queryset.filter(brand_id__in=params['device_brands'])
+    return queryset
+
+
+def filter_report_tickets(company, params):
+    queryset = ServiceTicket.objects.filter(device__in=filter_report_devices(company, params))
+
+    if params.get('history_date_from'):
+        queryset = queryset.filter(created_at__date__gte=params['history_date_from'])
+    if params.get('history_date_to'):
+        queryset = queryset.filter(created_at__date__lte=params['history_date_to'])
+    return queryset
+
+
+def build_report_devices(company, params):
+    queryset = filter_report_devices(company, params)
+
+    prefetch_list = [
+        'owner',
+        'brand'
+    ]
+
+    if params.get('include_service_history'):
+        tickets_queryset = ServiceTicket.objects.select_related('assigned_technician').order_by('-created_at')
+        if params.get('history_date_from'):
+            tickets_queryset = tickets_queryset.filter(created_at__date__gte=params['history_date_from'])
+        if params.get('history_date_to'):
+            tickets_queryset = tickets_queryset.filter(created_at__date__lte=params['history_date_to'])
+
+        prefetch_list.append(
+            Prefetch('tickets', queryset=tickets_queryset, to_attr='filtered_tickets')
+        )
+
+    if params.get('include_event_log'):
+        prefetch_list.append(Prefetch('history_entries',
+                                      queryset=DeviceHistoryEntry.objects.select_related('actor').order_by(
+                                          '-event_date')))
+
+    return queryset.prefetch_related(*prefetch_list).order_by('owner__name', 'model_name')
+
+
+def render_report_pdf(company, devices, params, base_url=None):
+    context = {
+        'devices': devices,
+        'params': params,
+        'generation_date': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'company_name': company.name
+    }
+    html_string = render_to_string('reports/generic_report.html', context)
+    return HTML(string=html_string, base_url=base_url).write_pdf()
@@ -1,14 +1,20 @@
+from datetime import timedelta
+
 from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from .models.users import CustomUser, Technician, Company
 from .models.clients import Client
 from .models.manufacturers import Manufacturer, Certification
 from .models.devices import FiscalDevice, DeviceHistoryEntry
 from .models.tickets import ServiceTicket
 from .models.billing import Order, ActivationCode
-from dateutil.relativedelta import relativedelta
-from geopy.geocoders import Nominatim
+from .models.reports import ReportJob
+from .models.imports import ImportJob
+from .geocoding import normalize_address, get_cached_coordinates
+from .analytics import ANALYTICS_DEFAULT_PERIOD_DAYS, ANALYTICS_MAX_PERIOD_DAYS
 
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
@@ -168,38 +174,55 @@ class ClientWriteSerializer(serializers.ModelSerializer):
         model = Client
         fields = ['name', 'address', 'nip', 'regon', 'phone_number', 'email']
 
-    def geocode(self, address):
-        geolocator = Nominatim(user_agent="myapp")
-        location = geolocator.geocode(address)
-        if location:
-            return location.latitude, location.longitude
-        return None, None
+    def apply_cached_coordinates(self, validated_data, address):
+        # Współrzędne z lokalnej tabeli, jeśli adres był już geokodowany; w przeciwnym razie
+        # zostaną uzupełnione w tle przez zadanie Celery (bez blokowania zapisu klienta).
+        coordinates = get_cached_coordinates(normalize_address(address)) if address else None
+        validated_data['latitude'], validated_data['longitude'] = coordinates or (None, None)
+        return coordinates is not None
+
+    def schedule_geocoding(self, client):
+        from api.tasks import geocode_client_address
+
+        transaction.on_commit(lambda: geocode_client_address.delay([client.id], client.address))
 
     def create(self, validated_data):
         address = validated_data.get('address')
-        if address:
-            lat, lng = self.geocode(address)
-            validated_data['latitude'] = lat
-            validated_data['longitude'] = lng
+        has_coordinates = self.apply_cached_coordinates(validated_data, address)
 
         request = self.context['request']
         company = request.user.technician_profile.company
         validated_data['company'] = company
 
-        return Client.objects.create(**validated_data)
+        client = Client.objects.create(**validated_data)
+        if address and not has_coordinates:
+            self.schedule_geocoding(client)
+        return client
 
     def update(self, instance, validated_data):
         new_address = validated_data.get('address', instance.address)
-        if new_address != instance.address:
-            lat, lng = self.geocode(new_address)
-            validated_data['latitude'] = lat
-            validated_data['longitude'] = lng
+        address_changed = new_address != instance.address
+        has_coordinates = True
+        if address_changed:
+            has_coordinates = self.apply_cached_coordinates(validated_data, new_address)
 
-        return super().update(instance, validated_data)
+        client = super().update(instance, validated_data)
+        if address_changed and new_address and not has_coordinates:
+            self.schedule_geocoding(client)
+        return client
 
     def validate_nip(self, value):
         return value
 
+class ClientBulkItemSerializer(serializers.ModelSerializer):
+    """Pojedynczy wiersz importu zbiorczego - unikalność NIP sprawdzana jest dla całej paczki naraz."""
+
+    class Meta:
+        model = Client
+        fields = ['name', 'address', 'nip', 'regon', 'phone_number', 'email']
+        validators = []
+
+
 class ManufacturerSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Manufacturer
@@ -249,6 +272,17 @@ class CertificationWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"manufacturer": "Manufacturer does not belong to your company."})
         return data
 
+class CertificationImportItemSerializer(serializers.ModelSerializer):
+    """Wiersz importu certyfikatów - serwisant i producent są już rozwiązani do ID w obrębie firmy."""
+    technician = serializers.IntegerField()
+    manufacturer = serializers.IntegerField()
+
+    class Meta:
+        model = Certification
+        fields = ['technician', 'manufacturer', 'certificate_number', 'issue_date', 'expiry_date']
+        validators = []
+
+
 class DeviceHistoryEntrySerializer(serializers.ModelSerializer):
     action_type_display = serializers.CharField(source='get_action_type_display', read_only=True)
     actor_name = serializers.CharField(source='actor.username', read_only=True, allow_null=True)
@@ -258,22 +292,22 @@ class DeviceHistoryEntrySerializer(serializers.ModelSerializer):
         fields = ['id', 'event_date', 'action_type', 'action_type_display', 'description', 'actor_name']
         read_only_fields = fields
 
-class FiscalDeviceReadSerializer(serializers.ModelSerializer):
+class FiscalDeviceListSerializer(serializers.ModelSerializer):
     owner = ClientSummarySerializer(read_only=True)
     brand = ManufacturerSummarySerializer(read_only=True)
     tickets_count = serializers.IntegerField(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
-    next_service_date = serializers.SerializerMethodField()
-    history_entries = DeviceHistoryEntrySerializer(many=True, read_only=True)
 
     class Meta:
         model = FiscalDevice
-        fields = ['id', 'brand', 'model_name', 'unique_number', 'serial_number', 'sale_date', 'last_service_date', 'next_service_date', 'status', 'status_display', 'operating_instructions', 'remarks', 'owner', 'tickets_count', 'history_entries']
+        fields = ['id', 'brand', 'model_name', 'unique_number', 'serial_number', 'sale_date', 'last_service_date', 'next_service_date', 'status', 'status_display', 'operating_instructions', 'remarks', 'owner', 'tickets_count']
 
-    def get_next_service_date(self, obj: FiscalDevice):
-        if obj.last_service_date:
-            return obj.last_service_date + relativedelta(years=2)
-        return None
+
+class FiscalDeviceReadSerializer(FiscalDeviceListSerializer):
+    history_entries = DeviceHistoryEntrySerializer(many=True, read_only=True)
+
+    class Meta(FiscalDeviceListSerializer.Meta):
+        fields = FiscalDeviceListSerializer.Meta.fields + ['history_entries']
 
 
 class FiscalDeviceWriteSerializer(serializers.ModelSerializer):
@@ -311,6 +345,20 @@ class FiscalDeviceWriteSerializer(serializers.ModelSerializer):
 
         return data
 
+class FiscalDeviceBulkItemSerializer(serializers.ModelSerializer):
+    """Pojedynczy wiersz importu zbiorczego - właściciel, marka i numer unikatowy sprawdzane są dla całej paczki."""
+    owner = serializers.IntegerField()
+    brand = serializers.IntegerField()
+    unique_number = serializers.CharField(max_length=100)
+
+    class Meta:
+        model = FiscalDevice
+        fields = [
+            'brand', 'model_name', 'unique_number', 'serial_number', 'sale_date',
+            'last_service_date', 'status', 'operating_instructions', 'remarks', 'owner'
+        ]
+
+
 class ServiceTicketTechnicianUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceTicket
@@ -465,6 +513,63 @@ class ReportParameterSerializer(serializers.Serializer):
         return data
 
 
+class TimeToCloseParameterSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False, help_text="Data ukończenia od (domyślnie 90 dni wstecz)")
+    date_to = serializers.DateField(required=False, help_text="Data ukończenia do (domyślnie dziś)")
+
+    def validate(self, data):
+        data.setdefault('date_to', timezone.localdate())
+        data.setdefault('date_from', data['date_to'] - timedelta(days=ANALYTICS_DEFAULT_PERIOD_DAYS))
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("Data 'od' nie może być późniejsza niż data 'do'.")
+        if (data['date_to'] - data['date_from']).days > ANALYTICS_MAX_PERIOD_DAYS:
+            raise serializers.ValidationError(f"Okres analizy nie może przekraczać {ANALYTICS_MAX_PERIOD_DAYS} dni.")
+        return data
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'status', 'status_display', 'output_format', 'parameters', 'error',
+                  'created_at', 'started_at', 'finished_at', 'download_url']
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.Status.DONE:
+            return None
+        url = reverse('reportjob-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'kind', 'kind_display', 'status', 'status_display', 'original_filename',
+                  'processed_rows', 'created_count', 'updated_count', 'error_count', 'row_errors', 'error',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class ImportJobCreateSerializer(serializers.ModelSerializer):
+    ALLOWED_EXTENSIONS = ('.csv', '.xlsx')
+
+    class Meta:
+        model = ImportJob
+        fields = ['kind', 'file']
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(self.ALLOWED_EXTENSIONS):
+            raise serializers.ValidationError("Obsługiwane są wyłącznie pliki CSV i XLSX.")
+        return value
+
+
 class ReportResultSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.name')
     client_nip = serializers.CharField(source='client.nip')
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models.chat import Message
+from .models.chat import Message, ChatReadMarker
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.full_name', read_only=True)
@@ -7,4 +7,22 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ['id', 'sender_id', 'sender_name', 'content', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'uuid', 'sender_id', 'sender_name', 'content', 'timestamp']
+
+
+class ChatReadMarkerSerializer(serializers.ModelSerializer):
+    last_read_id = serializers.IntegerField(source='last_read_message_id', read_only=True)
+    last_read_uuid = serializers.UUIDField(source='last_read_message.uuid', read_only=True, default=None)
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatReadMarker
+        fields = ['last_read_id', 'last_read_uuid', 'unread_count', 'updated_at']
+
+    def get_unread_count(self, obj):
+        return self.context.get('unread_count')
+
+
+class ChatReadMarkerUpdateSerializer(serializers.Serializer):
+    # ID z historii albo UUID z wiadomości rozgłoszonej przez WebSocket.
+    message = serializers.CharField()
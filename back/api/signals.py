@@ -1,56 +1,77 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
+from django.contrib.auth import get_user_model
 
+from .charts import bump_chart_version
+from .client_map import bump_client_map_version
+from .context import invalidate_identities
+from .eligibility import bump_eligibility_version
+from .counters import (
+    bump_company_counters, bump_client_counters, refresh_certification_counters, bump_ticket_stats, ticket_stats_entry,
+)
+from .models.clients import Client
+from .models.counters import ClientCounters
+from .models.manufacturers import Certification
 from .models.tickets import ServiceTicket
 from .models.devices import FiscalDevice, DeviceHistoryEntry
+from .models.users import Company, Technician
+from .transactions import on_commit_once
 
 
 @receiver(pre_save, sender=ServiceTicket)
 def capture_previous_ticket_state(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old_instance = ServiceTicket.objects.get(pk=instance.pk)
-            instance._previous_status = old_instance.status
-            instance._previous_device_id = old_instance.device_id
-        except ServiceTicket.DoesNotExist:
-            instance._previous_status = None
-            instance._previous_device_id = None
+    instance._previous_state = None
+    instance._previous_status = None
+    instance._previous_device_id = None
+    instance._previous_client_id = None
+
+    if not instance.pk:
+        return
+
+    if instance.has_loaded_values():
+        previous = {field: instance.get_loaded_value(field) for field in ServiceTicket.tracked_fields}
     else:
-        instance._previous_status = None
-        instance._previous_device_id = None
+        # Instancja zbudowana ręcznie (nie z bazy) - poprzedni stan trzeba odczytać.
+        previous = ServiceTicket.objects.filter(pk=instance.pk).values(*ServiceTicket.tracked_fields).first()
+
+    if previous:
+        instance._previous_state = previous
+        instance._previous_status = previous['status']
+        instance._previous_device_id = previous['device_id']
+        instance._previous_client_id = previous['client_id']
 
 
 @receiver(post_save, sender=ServiceTicket)
 def update_device_status_on_ticket_change(sender, instance, created, **kwargs):
     previous_status = getattr(instance, '_previous_status', None)
     previous_device_id = getattr(instance, '_previous_device_id', None)
-    current_status = instance.status
-    current_device = instance.device
+    current_device_id = instance.device_id
 
-    if not created and previous_status == current_status and previous_device_id == (
-    current_device.id if current_device else None):
+    if not created and previous_status == instance.status and previous_device_id == current_device_id:
         return
 
     devices_to_update = set()
 
-    if current_device:
-        devices_to_update.add(current_device.id)
+    if current_device_id:
+        devices_to_update.add(current_device_id)
 
-    if previous_device_id and previous_device_id != (current_device.id if current_device else None):
+    if previous_device_id and previous_device_id != current_device_id:
         devices_to_update.add(previous_device_id)
 
+    if not devices_to_update:
+        return
+
     with transaction.atomic():
-        for device_id in devices_to_update:
-            try:
-                device = FiscalDevice.objects.select_for_update().get(id=device_id)
-            except FiscalDevice.DoesNotExist:
-                continue
+        devices = FiscalDevice.objects.select_for_update().filter(id__in=devices_to_update)
+
+        devices_with_active_tickets = set(ServiceTicket.objects.filter(
+            device_id__in=devices_to_update,
+            status__in=[ServiceTicket.Status.OPEN, ServiceTicket.Status.IN_PROGRESS]
+        ).values_list('device_id', flat=True).distinct())
 
-            has_active_tickets = ServiceTicket.objects.filter(
-                device_id=device_id,
-                status__in=[ServiceTicket.Status.OPEN, ServiceTicket.Status.IN_PROGRESS]
-            ).exists()
+        for device in devices:
+            has_active_tickets = device.id in devices_with_active_tickets
 
             old_device_status = device.status
             new_device_status = None
@@ -93,4 +114,211 @@ def log_ticket_creation_to_device_history(sender, instance, created, **kwargs):
             action_type=action_type,
             description=f"Utworzono nowe zgłoszenie serwisowe nr {instance.ticket_number} ('{instance.title}').",
             actor=None
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=ServiceTicket)
+def update_counters_on_ticket_save(sender, instance, created, **kwargs):
+    is_open = int(instance.status == ServiceTicket.Status.OPEN)
+
+    if created:
+        bump_client_counters(instance.client_id, tickets_count=1, open_tickets_count=is_open)
+        bump_company_counters(instance.client.company_id, open_tickets_count=is_open)
+        return
+
+    previous_client_id = getattr(instance, '_previous_client_id', None) or instance.client_id
+    was_open = int(getattr(instance, '_previous_status', None) == ServiceTicket.Status.OPEN)
+
+    if previous_client_id == instance.client_id and was_open == is_open:
+        return
+
+    if previous_client_id != instance.client_id:
+        bump_client_counters(previous_client_id, tickets_count=-1, open_tickets_count=-was_open)
+        bump_client_counters(instance.client_id, tickets_count=1, open_tickets_count=is_open)
+    else:
+        bump_client_counters(instance.client_id, open_tickets_count=is_open - was_open)
+    bump_company_counters(instance.client.company_id, open_tickets_count=is_open - was_open)
+
+
+@receiver(post_delete, sender=ServiceTicket)
+def update_counters_on_ticket_delete(sender, instance, **kwargs):
+    was_open = int(instance.status == ServiceTicket.Status.OPEN)
+    bump_client_counters(instance.client_id, tickets_count=-1, open_tickets_count=-was_open)
+    bump_company_counters(instance.client.company_id, open_tickets_count=-was_open)
+
+
+def _ticket_stats_entry(ticket, company_id, state):
+    return ticket_stats_entry(
+        company_id, ticket.created_at, state['ticket_type'], state['status'], state['resolution'], state['completed_at']
+    )
+
+
+@receiver(post_save, sender=ServiceTicket)
+def update_ticket_stats_on_ticket_save(sender, instance, created, **kwargs):
+    company_id = instance.client.company_id
+    current = {field: getattr(instance, field) for field in ServiceTicket.tracked_fields}
+    new_entry = _ticket_stats_entry(instance, company_id, current)
+
+    previous = getattr(instance, '_previous_state', None)
+    if not created and previous:
+        previous_company_id = company_id
+        if previous['client_id'] != instance.client_id:
+            previous_company_id = Client.objects.filter(pk=previous['client_id']).values_list(
+                'company_id', flat=True
+            ).first()
+        old_entry = _ticket_stats_entry(instance, previous_company_id, previous)
+        if old_entry == new_entry:
+            return
+        bump_ticket_stats(*old_entry, sign=-1)
+
+    bump_ticket_stats(*new_entry)
+
+
+@receiver(post_delete, sender=ServiceTicket)
+def update_ticket_stats_on_ticket_delete(sender, instance, **kwargs):
+    current = {field: getattr(instance, field) for field in ServiceTicket.tracked_fields}
+    bump_ticket_stats(*_ticket_stats_entry(instance, instance.client.company_id, current), sign=-1)
+
+
+@receiver(pre_save, sender=FiscalDevice)
+def capture_previous_device_owner(sender, instance, **kwargs):
+    instance._previous_owner_id = None
+    if instance.pk:
+        instance._previous_owner_id = FiscalDevice.objects.filter(pk=instance.pk).values_list(
+            'owner_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=FiscalDevice)
+def update_counters_on_device_save(sender, instance, created, **kwargs):
+    if created:
+        bump_client_counters(instance.owner_id, devices_count=1)
+        bump_company_counters(instance.owner.company_id, devices_count=1)
+        return
+
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if previous_owner_id and previous_owner_id != instance.owner_id:
+        bump_client_counters(previous_owner_id, devices_count=-1)
+        bump_client_counters(instance.owner_id, devices_count=1)
+
+
+@receiver(post_delete, sender=FiscalDevice)
+def update_counters_on_device_delete(sender, instance, **kwargs):
+    bump_client_counters(instance.owner_id, devices_count=-1)
+    company_id = Client.objects.filter(pk=instance.owner_id).values_list('company_id', flat=True).first()
+    bump_company_counters(company_id, devices_count=-1)
+
+
+@receiver(post_save, sender=Client)
+def update_counters_on_client_save(sender, instance, created, **kwargs):
+    if created:
+        ClientCounters.objects.get_or_create(client=instance)
+        bump_company_counters(instance.company_id, clients_count=1)
+
+
+@receiver(post_delete, sender=Client)
+def update_counters_on_client_delete(sender, instance, **kwargs):
+    bump_company_counters(instance.company_id, clients_count=-1)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client_map_on_client_change(sender, instance, **kwargs):
+    bump_client_map_version(instance.company_id)
+
+
+@receiver(post_save, sender=ServiceTicket)
+def invalidate_client_map_on_ticket_save(sender, instance, created, **kwargs):
+    is_open = instance.status == ServiceTicket.Status.OPEN
+    if created:
+        changed = is_open
+    else:
+        was_open = getattr(instance, '_previous_status', None) == ServiceTicket.Status.OPEN
+        previous_client_id = getattr(instance, '_previous_client_id', None) or instance.client_id
+        changed = was_open != is_open or (previous_client_id != instance.client_id and is_open)
+    if changed:
+        bump_client_map_version(instance.client.company_id)
+
+
+@receiver(post_delete, sender=ServiceTicket)
+def invalidate_client_map_on_ticket_delete(sender, instance, **kwargs):
+    if instance.status == ServiceTicket.Status.OPEN:
+        bump_client_map_version(instance.client.company_id)
+
+
+@receiver(post_save, sender=Certification)
+@receiver(post_delete, sender=Certification)
+def update_counters_on_certification_change(sender, instance, **kwargs):
+    company_id = instance.technician.company_id
+    transaction.on_commit(lambda: refresh_certification_counters(company_id))
+
+
+def _company_of_client(client_id):
+    return Client.objects.filter(pk=client_id).values_list('company_id', flat=True).first()
+
+
+def _company_of_technician(technician_id):
+    return Technician.objects.filter(pk=technician_id).values_list('company_id', flat=True).first()
+
+
+# Firma jest ustalana dopiero po zatwierdzeniu, raz na klienta/serwisanta w transakcji - pętle
+# usuwające wiele zgłoszeń czy urządzeń nie odpytują bazy i cache dla każdego wiersza.
+@receiver(post_save, sender=ServiceTicket)
+@receiver(post_delete, sender=ServiceTicket)
+def invalidate_charts_on_ticket_change(sender, instance, **kwargs):
+    client_id = instance.client_id
+    on_commit_once(('charts:client', client_id), lambda: bump_chart_version(_company_of_client(client_id)))
+
+
+@receiver(post_save, sender=FiscalDevice)
+@receiver(post_delete, sender=FiscalDevice)
+def invalidate_charts_on_device_change(sender, instance, **kwargs):
+    owner_id = instance.owner_id
+    on_commit_once(('charts:client', owner_id), lambda: bump_chart_version(_company_of_client(owner_id)))
+
+
+@receiver(post_save, sender=Certification)
+@receiver(post_delete, sender=Certification)
+def invalidate_charts_on_certification_change(sender, instance, **kwargs):
+    technician_id = instance.technician_id
+    on_commit_once(
+        ('charts:technician', technician_id),
+        lambda: bump_chart_version(_company_of_technician(technician_id)),
+    )
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Technician)
+def invalidate_charts_on_owner_delete(sender, instance, **kwargs):
+    # Kaskadowo usunięte urządzenia/certyfikaty nie wskażą już firmy po zatwierdzeniu.
+    bump_chart_version(instance.company_id)
+
+
+@receiver(post_save, sender=Certification)
+@receiver(post_delete, sender=Certification)
+def invalidate_eligibility_on_certification_change(sender, instance, **kwargs):
+    bump_eligibility_version(instance.technician.company_id)
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+def invalidate_eligibility_on_technician_change(sender, instance, **kwargs):
+    bump_eligibility_version(instance.company_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_identity(sender, instance, **kwargs):
+    invalidate_identities([instance.pk])
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+def invalidate_technician_identity(sender, instance, **kwargs):
+    invalidate_identities([instance.user_id])
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_identities(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_identities(instance.technicians.values_list('user_id', flat=True))
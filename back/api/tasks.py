@@ -1,10 +1,13 @@
 from celery import shared_task
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string, get_template
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
+from django.db.models import F, Q
 from django.utils import timezone
 from datetime import timedelta
+from smtplib import SMTPException
 import logging
+import time
 
 from .models.devices import FiscalDevice
 from .models.clients import Client
@@ -12,22 +15,28 @@ from .models.clients import Client
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
-def send_device_inspection_reminder(self, device_id, trigger_user_id=None):
+INSPECTION_REMINDER_SUBJECT = 'Przypomnienie o zbliżającym się przeglądzie urządzenia'
+
+
+def _load_template(name):
     try:
-        device = FiscalDevice.objects.select_related('owner', 'brand').get(pk=device_id)
-    except FiscalDevice.DoesNotExist:
-        logger.warning("send_device_inspection_reminder: device %s does not exist", device_id)
-        return False
+        return get_template(name)
+    except Exception:
+        logger.exception("Failed to load template %s", name)
+        return None
 
-    client = device.owner
-    recipient_email = getattr(client, 'email', None)
 
-    if not recipient_email:
-        logger.warning("send_device_inspection_reminder: device %s owner has no email", device_id)
-        return False
+def _load_inspection_reminder_templates():
+    return (
+        _load_template('emails/inspection_reminder.txt'),
+        _load_template('emails/inspection_reminder.html'),
+    )
+
 
-    client_name = getattr(client, 'name', '') or getattr(client, 'company_name', '') or recipient_email
+def _inspection_reminder_context(device):
+    client = device.owner
+
+    client_name = getattr(client, 'name', '') or getattr(client, 'company_name', '') or client.email
     brand_name = getattr(device.brand, 'name', '') if getattr(device, 'brand', None) else ''
     model_name = getattr(device, 'model_name', '') if hasattr(device, 'model_name') else ''
     device_brand_model = (brand_name + ' ' + model_name).strip() or 'Brak danych'
@@ -36,18 +45,17 @@ def send_device_inspection_reminder(self, device_id, trigger_user_id=None):
 
     last_service_date_obj = getattr(device, 'last_service_date', None)
     if last_service_date_obj:
-        last_service_date = timezone.localtime(last_service_date_obj).strftime('%Y-%m-%d')
+        last_service_date = last_service_date_obj.strftime('%Y-%m-%d')
     else:
         last_service_date = 'Brak danych'
 
-    interval_days = int(getattr(settings, 'SERVICE_INTERVAL_DAYS', 365))
-    if last_service_date_obj:
-        next_service_date_obj = last_service_date_obj + timedelta(days=interval_days)
-        next_service_date = timezone.localtime(next_service_date_obj).strftime('%Y-%m-%d')
+    next_service_date_obj = FiscalDevice.compute_next_service_date(last_service_date_obj)
+    if next_service_date_obj:
+        next_service_date = next_service_date_obj.strftime('%Y-%m-%d')
     else:
-        next_service_date = 'Proponowana: za {} dni'.format(interval_days)
+        next_service_date = 'Brak danych'
 
-    context = {
+    return {
         'client_name': client_name,
         'device_brand_model': device_brand_model,
         'device_unique_number': device_unique_number,
@@ -55,24 +63,31 @@ def send_device_inspection_reminder(self, device_id, trigger_user_id=None):
         'next_service_date': next_service_date,
     }
 
-    subject = 'Przypomnienie o zbliżającym się przeglądzie urządzenia'
+
+def _build_inspection_reminder(device, text_template, html_template, connection=None):
+    recipient_email = getattr(device.owner, 'email', None)
+    if not recipient_email:
+        return None
+
+    context = _inspection_reminder_context(device)
+    subject = INSPECTION_REMINDER_SUBJECT
 
     try:
-        text_body = render_to_string('emails/inspection_reminder.txt', context)
+        text_body = text_template.render(context)
     except Exception:
         text_body = (
             f"Temat: {subject}\n\n"
-            f"Witaj {client_name},\n\n"
-            f"Marka i model: {device_brand_model}\n"
-            f"Numer unikatowy: {device_unique_number}\n\n"
-            f"Data ostatniego przeglądu: {last_service_date}\n"
-            f"Sugerowana data następnego przeglądu: {next_service_date}\n\n"
+            f"Witaj {context['client_name']},\n\n"
+            f"Marka i model: {context['device_brand_model']}\n"
+            f"Numer unikatowy: {context['device_unique_number']}\n\n"
+            f"Data ostatniego przeglądu: {context['last_service_date']}\n"
+            f"Sugerowana data następnego przeglądu: {context['next_service_date']}\n\n"
             "Prosimy o kontakt w celu umówienia wizyty serwisanta.\n\n"
             "Z poważaniem,\nTwój Serwis Fiskalny"
         )
 
     try:
-        html_body = render_to_string('emails/inspection_reminder.html', context)
+        html_body = html_template.render(context)
     except Exception:
         html_body = "<html><body><pre style='font-family: sans-serif;'>" + (text_body.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')) + "</pre></body></html>"
 
@@ -81,30 +96,115 @@ def send_device_inspection_reminder(self, device_id, trigger_user_id=None):
         body=text_body,
         from_email=settings.DEFAULT_FROM_EMAIL,
         to=[recipient_email],
+        connection=connection,
     )
     msg.attach_alternative(html_body, "text/html")
+    return msg
+
+
+def _mark_reminders_sent(device_ids):
+    if device_ids:
+        FiscalDevice.objects.filter(pk__in=device_ids).update(
+            last_reminder_sent=timezone.now(),
+            reminder_count=F('reminder_count') + 1,
+        )
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def send_device_inspection_reminder(self, device_id, trigger_user_id=None):
+    try:
+        device = FiscalDevice.objects.select_related('owner', 'brand').get(pk=device_id)
+    except FiscalDevice.DoesNotExist:
+        logger.warning("send_device_inspection_reminder: device %s does not exist", device_id)
+        return False
+
+    msg = _build_inspection_reminder(device, *_load_inspection_reminder_templates())
+    if msg is None:
+        logger.warning("send_device_inspection_reminder: device %s owner has no email", device_id)
+        return False
 
     try:
         msg.send(fail_silently=False)
     except Exception as e:
-        logger.exception("send_device_inspection_reminder: failed to send email for device %s to %s", device_id, recipient_email)
+        logger.exception("send_device_inspection_reminder: failed to send email for device %s to %s", device_id, msg.to)
         raise
 
+    _mark_reminders_sent([device.id])
+    logger.info("send_device_inspection_reminder: sent reminder for device %s to %s", device_id, msg.to)
+    return True
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def send_device_inspection_reminders_batch(self, device_ids):
+    devices = FiscalDevice.objects.select_related('owner', 'brand').filter(pk__in=device_ids)
+    text_template, html_template = _load_inspection_reminder_templates()
+
+    connection = get_connection(fail_silently=False)
+    sent_ids = []
+    failed_ids = []
+
     try:
-        updated = False
-        if hasattr(device, 'last_reminder_sent'):
-            device.last_reminder_sent = timezone.now()
-            updated = True
-        if hasattr(device, 'reminder_count'):
-            device.reminder_count = (device.reminder_count or 0) + 1
-            updated = True
-        if updated:
-            device.save(update_fields=[f for f in ['last_reminder_sent', 'reminder_count'] if hasattr(device, f)])
-    except Exception:
-        logger.exception("send_device_inspection_reminder: failed to update reminder meta for device %s", device_id)
+        connection.open()
+    except (SMTPException, OSError) as exc:
+        # Serwer SMTP niedostępny lub odrzucił logowanie - ponawiamy cały pakiet.
+        logger.warning("send_device_inspection_reminders_batch: cannot open SMTP connection: %s", exc)
+        raise self.retry(exc=exc, args=(device_ids,))
+
+    # Jedno połączenie SMTP na cały pakiet; błąd pojedynczej wiadomości nie przerywa wysyłki,
+    # a ponowienie obejmuje tylko urządzenia, do których nie udało się wysłać.
+    with connection:
+        for device in devices:
+            msg = _build_inspection_reminder(device, text_template, html_template, connection=connection)
+            if msg is None:
+                continue
+            try:
+                connection.send_messages([msg])
+                sent_ids.append(device.id)
+            except Exception:
+                logger.exception("send_device_inspection_reminders_batch: failed to send reminder for device %s", device.id)
+                failed_ids.append(device.id)
+
+    _mark_reminders_sent(sent_ids)
+    logger.info("send_device_inspection_reminders_batch: sent %s of %s reminders", len(sent_ids), len(device_ids))
+
+    if failed_ids:
+        raise self.retry(args=(failed_ids,))
+    return len(sent_ids)
+
+
+def get_devices_due_for_reminder(today=None):
+    today = today or timezone.localdate()
+    window_end = today + timedelta(days=int(getattr(settings, 'REMINDER_WINDOW_DAYS', 30)))
+
+    # Przypomnienie wysłane przed ostatnim przeglądem lub w dniu przeglądu dotyczy poprzedniego cyklu.
+    not_reminded = Q(last_reminder_sent__isnull=True) | Q(last_reminder_sent__date__lte=F('last_service_date'))
+
+    # Bez dolnej granicy - urządzenia po terminie (np. brak e-maila lub przerwa w harmonogramie)
+    # nadal dostają przypomnienie, raz na cykl.
+    return FiscalDevice.objects.filter(
+        not_reminded,
+        next_service_date__lte=window_end,
+        owner__email__gt='',
+    ).exclude(status=FiscalDevice.Status.DECOMMISSIONED)
+
+
+@shared_task
+def schedule_inspection_reminders():
+    device_ids = list(
+        get_devices_due_for_reminder().order_by('next_service_date', 'id').values_list('id', flat=True)
+    )
 
-    logger.info("send_device_inspection_reminder: sent reminder for device %s to %s", device_id, recipient_email)
-    return True
+    batch_size = int(getattr(settings, 'REMINDER_BATCH_SIZE', 100))
+    interval = int(getattr(settings, 'REMINDER_BATCH_INTERVAL_SECONDS', 60))
+
+    for index, start in enumerate(range(0, len(device_ids), batch_size)):
+        send_device_inspection_reminders_batch.apply_async(
+            args=(device_ids[start:start + batch_size],),
+            countdown=index * interval,
+        )
+
+    logger.info("schedule_inspection_reminders: scheduled %s reminders", len(device_ids))
+    return len(device_ids)
 
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
@@ -201,3 +301,151 @@ def send_activation_code_email(self, activation_code_id):
     except Exception as e:
         logger.exception(f"send_activation_code_email: Failed to send email to {recipient_email}: {e}")
         raise
+
+
+@shared_task
+def reconcile_company_counters(company_id):
+    from .charts import bump_chart_version
+    from .counters import rebuild_company_counters, rebuild_client_counters, rebuild_ticket_stats
+
+    rebuild_company_counters(company_id)
+    rebuild_client_counters(company_id)
+    rebuild_ticket_stats(company_id)
+    bump_chart_version(company_id)
+    return True
+
+
+@shared_task
+def reconcile_dashboard_counters():
+    from .models.users import Company
+
+    company_ids = list(Company.objects.values_list('id', flat=True))
+    for company_id in company_ids:
+        reconcile_company_counters.delay(company_id)
+
+    logger.info("reconcile_dashboard_counters: scheduled reconciliation for %s companies", len(company_ids))
+    return len(company_ids)
+
+
+@shared_task(bind=True, max_retries=0)
+def generate_report_job(self, job_id):
+    from django.core.files.base import ContentFile
+    from .models.reports import ReportJob
+    from .reports import build_report_devices, render_report_pdf
+    from .serializers import ReportParameterSerializer
+
+    try:
+        job = ReportJob.objects.select_related('company').get(pk=job_id)
+    except ReportJob.DoesNotExist:
+        logger.warning("generate_report_job: ReportJob %s does not exist", job_id)
+        return False
+
+    job.status = ReportJob.Status.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        serializer = ReportParameterSerializer(data=job.parameters)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        devices = build_report_devices(job.company, params)
+        pdf_file = render_report_pdf(job.company, devices, params, base_url=settings.FRONTEND_URL)
+
+        job.file.save(f"raport_{job.id}.pdf", ContentFile(pdf_file), save=False)
+        job.status = ReportJob.Status.DONE
+        job.error = ''
+    except Exception as e:
+        logger.exception("generate_report_job: failed to generate report %s", job_id)
+        job.status = ReportJob.Status.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    return job.status == ReportJob.Status.DONE
+
+
+@shared_task(bind=True, max_retries=0)
+def run_import_job(self, job_id):
+    from .imports import ImportFileError, ImportProgress, process_import_job
+    from .models.imports import ImportJob
+
+    try:
+        job = ImportJob.objects.select_related('company', 'requested_by').get(pk=job_id)
+    except ImportJob.DoesNotExist:
+        logger.warning("run_import_job: ImportJob %s does not exist", job_id)
+        return False
+
+    job.status = ImportJob.Status.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    progress = ImportProgress()
+    try:
+        process_import_job(job, progress)
+        job.status = ImportJob.Status.DONE
+        job.error = ''
+    except ImportFileError as e:
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+    except Exception as e:
+        logger.exception("run_import_job: import %s failed", job_id)
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+
+    # Także po błędzie - wiersze z wcześniejszych paczek zostały zapisane, a ich błędy są potrzebne użytkownikowi.
+    job.processed_rows = progress.processed
+    job.created_count = progress.created
+    job.updated_count = progress.updated
+    job.error_count = progress.error_count
+    job.row_errors = progress.errors
+    update_fields = [
+        'status', 'error', 'finished_at',
+        'processed_rows', 'created_count', 'updated_count', 'error_count', 'row_errors',
+    ]
+    job.finished_at = timezone.now()
+    job.save(update_fields=update_fields)
+    return job.status == ImportJob.Status.DONE
+
+
+@shared_task(bind=True, max_retries=5)
+def geocode_client_address(self, client_ids, address, slot=None):
+    from geopy.exc import GeopyError
+    from .geocoding import (
+        normalize_address, get_cached_coordinates, reserve_nominatim_slot, seconds_until_slot,
+        get_min_interval, geocode_with_nominatim, store_coordinates,
+    )
+
+    address_key = normalize_address(address)
+    if not address_key:
+        return None
+
+    coordinates = get_cached_coordinates(address_key)
+    if coordinates is None:
+        if slot is None:
+            slot = reserve_nominatim_slot()
+        delay = seconds_until_slot(slot)
+        if delay > get_min_interval():
+            # Slot jest dalej w kolejce - zadanie wraca do brokera na jego termin, bez zużywania ponowień.
+            geocode_client_address.apply_async(args=(client_ids, address), kwargs={'slot': slot}, countdown=delay)
+            return None
+        time.sleep(delay)
+        try:
+            coordinates = geocode_with_nominatim(address)
+        except GeopyError as exc:
+            logger.warning("geocode_client_address: geocoding failed for '%s': %s", address_key, exc)
+            raise self.retry(exc=exc, countdown=60, kwargs={})
+        store_coordinates(address_key, *coordinates)
+
+    # Klient mógł w międzyczasie zmienić adres - aktualizujemy tylko tych, których adres nadal pasuje.
+    matching_ids = [
+        client.pk for client in Client.objects.filter(pk__in=client_ids).only('pk', 'address')
+        if normalize_address(client.address) == address_key
+    ]
+    latitude, longitude = coordinates
+    Client.objects.filter(pk__in=matching_ids).update(latitude=latitude, longitude=longitude)
+
+    from .client_map import bump_client_map_version
+    for company_id in Client.objects.filter(pk__in=matching_ids).values_list('company_id', flat=True).distinct():
+        bump_client_map_version(company_id)
+    return coordinates
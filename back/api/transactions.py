@@ -0,0 +1,27 @@
+from django.db import transaction
+
+
+def on_commit_once(key, func, using=None):
+    """
+    transaction.on_commit z jedną rejestracją na klucz w obrębie transakcji.
+
+    Pętle zapisujące lub usuwające wiele wierszy (np. kaskadowe usuwanie) wywołują sygnały
+    per wiersz - unieważnienie cache danej firmy wystarczy wykonać raz, po zatwierdzeniu.
+    Poza blokiem atomic funkcja wykonuje się od razu, tak jak w transaction.on_commit.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        func()
+        return
+
+    # Django podmienia listę run_on_commit przy zatwierdzeniu i wycofaniu transakcji oraz przy
+    # wycofaniu savepointu - zapamiętane klucze są ważne tylko dla bieżącej listy.
+    pending = getattr(connection, '_on_commit_once_keys', None)
+    if pending is None or pending[0] is not connection.run_on_commit:
+        pending = (connection.run_on_commit, set())
+        connection._on_commit_once_keys = pending
+
+    if key in pending[1]:
+        return
+    pending[1].add(key)
+    transaction.on_commit(func, using=using)
@@ -18,6 +18,8 @@ router.register(r'tickets', views.ServiceTicketViewSet, basename='serviceticket'
 router.register(r'orders', views.OrderViewSet, basename='order')
 router.register(r'activation-codes', views.ActivationCodeViewSet, basename='activationcode')
 router.register(r'messages', MessageViewSet, basename='message')
+router.register(r'reports/jobs', views.ReportJobViewSet, basename='reportjob')
+router.register(r'imports', views.ImportJobViewSet, basename='importjob')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -25,6 +27,7 @@ urlpatterns = [
     path('company/me/', views.ManageCompanyView.as_view(), name='manage-company'),
     path('register/', views.RegisterView.as_view(), name='register'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('external/company-data/batch/', views.fetch_company_data_batch, name='fetch-company-data-batch'),
     path('external/company-data/<str:nip>/', views.fetch_company_data, name='fetch-company-data'),
 
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -39,6 +42,7 @@ urlpatterns = [
 
     path('devices/<int:device_id>/export-pdf/', views.export_device_pdf, name='export-device-pdf'),
     path('charts/', views.ChartView.as_view(), name='charts-data'),
+    path('analytics/time-to-close/', views.TimeToCloseAnalyticsView.as_view(), name='analytics-time-to-close'),
 
     path('reports/generate/', views.GenerateReportView.as_view(), name='generate-report'),
     path('reports/filter-options/', views.ReportFilterOptionsView.as_view(), name='report-filter-options'),
@@ -1,9 +1,6 @@
-import csv
-from collections import defaultdict
-from datetime import timedelta, datetime, date
+from datetime import timedelta
+import math
 import stripe
-import requests
-from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
 from django.db import transaction
@@ -13,7 +10,7 @@ from django.db.models import Count, Exists, OuterRef
 from django.utils import timezone
 from rest_framework import viewsets, generics, permissions, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.renderers import JSONRenderer, BaseRenderer
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
@@ -25,10 +22,13 @@ from .models.manufacturers import Manufacturer, Certification
 from .models.devices import FiscalDevice, DeviceHistoryEntry
 from .models.tickets import ServiceTicket
 from .models.billing import Order, ActivationCode
+from .models.reports import ReportJob
+from .models.imports import ImportJob
 
 from django.db.models import Q
 
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, HttpResponseNotModified
+from django.urls import reverse
 from django.template.loader import render_to_string
 from weasyprint import HTML
 import json
@@ -41,14 +41,33 @@ from .serializers import (
     ClientReadSerializer, ClientWriteSerializer,
     ManufacturerSummarySerializer, ManufacturerWriteSerializer,
     CertificationReadSerializer, CertificationWriteSerializer,
-    FiscalDeviceReadSerializer, FiscalDeviceWriteSerializer,
+    FiscalDeviceReadSerializer, FiscalDeviceWriteSerializer, FiscalDeviceListSerializer, DeviceHistoryEntrySerializer,
     ServiceTicketReadSerializer, ServiceTicketWriteSerializer,
     OrderReadSerializer, OrderWriteSerializer,
     ActivationCodeReadSerializer, ActivationCodeWriteSerializer, CompanySerializer, UserProfileSerializer,
     ServiceTicketTechnicianUpdateSerializer, ServiceTicketResolveSerializer, ClientLocationSerializer,
     ReportResultSerializer, ReportParameterSerializer, ConfirmEmailChangeSerializer, ChangeEmailSerializer,
-    AiSuggestionRequestSerializer, TechnicianSummarySerializer
+    AiSuggestionRequestSerializer, TechnicianSummarySerializer, ReportJobSerializer,
+    ClientBulkItemSerializer, FiscalDeviceBulkItemSerializer, ImportJobSerializer, ImportJobCreateSerializer,
+    TimeToCloseParameterSerializer,
 )
+from .pagination import KeysetPagination
+from .context import get_company_context
+from .bulk import (
+    BULK_MAX_ROWS, bulk_create_clients, bulk_create_devices, validate_bulk_clients, validate_bulk_devices,
+)
+from .analytics import get_time_to_close
+from .charts import get_chart_data
+from .eligibility import eligible_technician_ids, get_eligibility_map
+from .client_map import (
+    client_points, count_tiles, get_cluster_max_zoom, get_cluster_tiles, MAP_MAX_POINTS, MAP_MAX_TILES, MAP_MAX_ZOOM,
+)
+from .counters import get_company_counters, get_client_counters
+from .reports import build_report_devices, filter_report_devices, filter_report_tickets
+from .exports import streaming_csv_response, DEVICE_CSV_COLUMNS, TICKET_CSV_COLUMNS
+from .pdf_cache import get_device_version, read_cached_pdf, store_cached_pdf
+from .tasks import generate_report_job, run_import_job
+from .whitelist import lookup_company, lookup_companies, WhiteListError, NOT_FOUND_DETAIL
 
 class IsCompanyMember(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -59,7 +78,7 @@ class IsCompanyMember(permissions.BasePermission):
         if user.is_superuser:
             return True
 
-        return hasattr(user, 'technician_profile')
+        return get_company_context(request).technician is not None
 
 
 class IsCompanyAdmin(permissions.BasePermission):
@@ -69,9 +88,7 @@ class IsCompanyAdmin(permissions.BasePermission):
             return False
         if user.is_staff or user.is_superuser:
             return True
-        if hasattr(user, 'technician_profile'):
-            return user.technician_profile.is_admin
-        return False
+        return get_company_context(request).is_admin
 
 
 class IsTicketAssigneeOrAdmin(permissions.BasePermission):
@@ -80,7 +97,7 @@ class IsTicketAssigneeOrAdmin(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        profile = getattr(request.user, 'technician_profile', None)
+        profile = get_company_context(request).technician
         if not profile:
             return False
 
@@ -95,8 +112,7 @@ class ManageCompanyView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated, IsCompanyMember]
 
     def get_object(self):
-        technician_profile = self.request.user.technician_profile
-        return technician_profile.company
+        return get_company_context(self.request).company
 
 
 
@@ -122,11 +138,32 @@ class RegisterView(generics.CreateAPIView):
             status=status.HTTP_201_CREATED
         )
 
+def parse_bulk_rows(request, item_serializer_class):
+    """Waliduje listę wierszy importu zbiorczego. Zwraca (validated_data, None) lub (None, Response z błędami)."""
+    rows = request.data
+    if not isinstance(rows, list) or not rows:
+        return None, Response({"detail": "Oczekiwano niepustej listy obiektów."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > BULK_MAX_ROWS:
+        return None, Response({"detail": f"Jednorazowo można przesłać maksymalnie {BULK_MAX_ROWS} wierszy."},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = item_serializer_class(data=rows, many=True)
+    if not serializer.is_valid():
+        return None, bulk_errors_response(dict(enumerate(serializer.errors)))
+    return serializer.validated_data, None
+
+
+def bulk_errors_response(errors_by_index):
+    errors = [{"index": index, "errors": errors} for index, errors in sorted(errors_by_index.items()) if errors]
+    return Response({"detail": "Przesłane dane zawierają błędy.", "errors": errors},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+
 class CompanyScopedViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
     def get_company(self):
-        return self.request.user.technician_profile.company
+        return get_company_context(self.request).company
 
     def get_queryset(self):
         return self.model.objects.filter(company=self.get_company())
@@ -142,9 +179,10 @@ class TechnicianViewSet(viewsets.ModelViewSet):
     search_fields = ['user__first_name', 'user__last_name', 'user__email', 'user__username']
     ordering_fields = ['user__first_name', 'user__last_name', 'role']
     ordering = ['user__first_name']
+    cursor_ordering = ('first_name', 'last_name', 'id')
 
     def get_queryset(self):
-        company = self.request.user.technician_profile.company
+        company = get_company_context(self.request).company
         return Technician.objects.select_related('user').filter(company=company)
 
     def get_serializer_class(self):
@@ -155,52 +193,64 @@ class TechnicianViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         technician = self.get_object()
-        today = timezone.now().date()
+        stats = self._aggregate_stats(Technician.objects.filter(pk=technician.pk))
+        return Response(stats[technician.pk])
+
+    @action(detail=False, methods=['get'], url_path='stats', url_name='team-stats')
+    def team_stats(self, request):
+        technicians = self.get_queryset()
+
+        raw_ids = request.query_params.get('ids')
+        if raw_ids:
+            try:
+                ids = [int(value) for value in raw_ids.split(',') if value.strip()]
+            except ValueError:
+                return Response({"detail": "Parametr 'ids' musi być listą liczb oddzielonych przecinkami."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            technicians = technicians.filter(id__in=ids)
 
-        assigned_tickets_count = ServiceTicket.objects.filter(
-            assigned_technician=technician
-        ).count()
+        stats = self._aggregate_stats(technicians)
+        return Response([{'technician_id': tech_id, **values} for tech_id, values in stats.items()])
 
-        open_tickets_count = ServiceTicket.objects.filter(
-            assigned_technician=technician,
-            status=ServiceTicket.Status.OPEN
-        ).count()
-
-        in_progress_tickets_count = ServiceTicket.objects.filter(
-            assigned_technician=technician,
-            status=ServiceTicket.Status.IN_PROGRESS
-        ).count()
-
-        closed_tickets_count = ServiceTicket.objects.filter(
-            assigned_technician=technician,
-            status=ServiceTicket.Status.CLOSED
-        ).count()
-
-        valid_certifications_count = Certification.objects.filter(
-            technician=technician,
-            expiry_date__gte=today
-        ).count()
-
-        expiring_soon_count = Certification.objects.filter(
-            technician=technician,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=30)
-        ).count()
-
-        expired_certifications_count = Certification.objects.filter(
-            technician=technician,
-            expiry_date__lt=today
-        ).count()
+    @staticmethod
+    def _aggregate_stats(technicians):
+        # Dwa zapytania niezależnie od liczby serwisantów: liczniki zleceń i certyfikatów
+        # liczone agregacją warunkową, grupowane po serwisancie.
+        today = timezone.now().date()
+        technicians = technicians.order_by().values('id')
+
+        ticket_rows = technicians.annotate(
+            assigned_tickets_count=Count('assigned_tickets'),
+            open_tickets_count=Count(
+                'assigned_tickets', filter=Q(assigned_tickets__status=ServiceTicket.Status.OPEN)
+            ),
+            in_progress_tickets_count=Count(
+                'assigned_tickets', filter=Q(assigned_tickets__status=ServiceTicket.Status.IN_PROGRESS)
+            ),
+            closed_tickets_count=Count(
+                'assigned_tickets', filter=Q(assigned_tickets__status=ServiceTicket.Status.CLOSED)
+            ),
+        )
 
-        return Response({
-            'assigned_tickets_count': assigned_tickets_count,
-            'open_tickets_count': open_tickets_count,
-            'in_progress_tickets_count': in_progress_tickets_count,
-            'closed_tickets_count': closed_tickets_count,
-            'valid_certifications_count': valid_certifications_count,
-            'expiring_soon_count': expiring_soon_count,
-            'expired_certifications_count': expired_certifications_count,
-        })
+        certification_rows = technicians.annotate(
+            valid_certifications_count=Count(
+                'certifications', filter=Q(certifications__expiry_date__gte=today)
+            ),
+            expiring_soon_count=Count(
+                'certifications', filter=Q(
+                    certifications__expiry_date__gte=today,
+                    certifications__expiry_date__lte=today + timedelta(days=30),
+                )
+            ),
+            expired_certifications_count=Count(
+                'certifications', filter=Q(certifications__expiry_date__lt=today)
+            ),
+        )
+
+        stats = {row.pop('id'): row for row in ticket_rows}
+        for row in certification_rows:
+            stats.setdefault(row.pop('id'), {}).update(row)
+        return stats
 
 
 class ClientViewSet(CompanyScopedViewSet):
@@ -211,9 +261,10 @@ class ClientViewSet(CompanyScopedViewSet):
     search_fields = ['name', 'nip', 'email']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    cursor_ordering = ('name', 'id')
 
     def get_serializer_class(self):
-        if self.action == 'locations':
+        if self.action in ['locations', 'map']:
             return ClientLocationSerializer
         if self.action in ['create', 'update', 'partial_update']:
             return ClientWriteSerializer
@@ -236,21 +287,62 @@ class ClientViewSet(CompanyScopedViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        rows, error_response = parse_bulk_rows(request, ClientBulkItemSerializer)
+        if error_response:
+            return error_response
+
+        company = get_company_context(request).company
+        errors = validate_bulk_clients(company, rows)
+        if errors:
+            return bulk_errors_response(errors)
+
+        clients = bulk_create_clients(company, rows)
+        serializer = ClientReadSerializer(clients, many=True, context=self.get_serializer_context())
+        return Response({"created": len(clients), "results": serializer.data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def map(self, request, *args, **kwargs):
+        try:
+            bbox = [float(value) for value in request.query_params.get('bbox', '').split(',')]
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response({"detail": "Wymagane parametry: bbox=minLng,minLat,maxLng,maxLat oraz zoom."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # NaN przechodzi każde porównanie, dlatego wartości nieskończone odrzucamy jawnie.
+        valid_bbox = len(bbox) == 4 and all(math.isfinite(value) for value in bbox) \
+            and bbox[0] <= bbox[2] and bbox[1] <= bbox[3]
+        if not valid_bbox or not 0 <= zoom <= MAP_MAX_ZOOM:
+            return Response({"detail": "Nieprawidłowy obszar mapy lub poziom przybliżenia."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        bbox = [max(bbox[0], -180.0), max(bbox[1], -90.0), min(bbox[2], 180.0), min(bbox[3], 90.0)]
+        company = get_company_context(request).company
+
+        # Także dla pojedynczych punktów - inaczej duży zoom z całym światem zwraca wszystkich klientów.
+        if count_tiles(bbox, zoom) > MAP_MAX_TILES:
+            return Response({"detail": "Obszar mapy jest zbyt duży dla podanego poziomu przybliżenia."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if zoom >= get_cluster_max_zoom():
+            points = client_points(company.id, bbox).order_by('id')[:MAP_MAX_POINTS]
+            serializer = self.get_serializer(points, many=True)
+            return Response({'zoom': zoom, 'clustered': False, 'results': serializer.data})
+
+        clusters = get_cluster_tiles(company.id, bbox, zoom)
+        return Response({'zoom': zoom, 'clustered': True, 'results': clusters})
+
     @action(detail=True, methods=['get'], url_path='stats')
     def stats(self, request, pk=None):
         client = self.get_object()
-
-        devices_count = FiscalDevice.objects.filter(owner=client).count()
-        tickets_count = ServiceTicket.objects.filter(client=client).count()
-        open_tickets_count = ServiceTicket.objects.filter(
-            client=client,
-            status=ServiceTicket.Status.OPEN
-        ).count()
+        counters = get_client_counters(client)
 
         return Response({
-            'devices_count': devices_count,
-            'tickets_count': tickets_count,
-            'open_tickets_count': open_tickets_count,
+            'devices_count': counters.devices_count,
+            'tickets_count': counters.tickets_count,
+            'open_tickets_count': counters.open_tickets_count,
         })
 
 
@@ -261,6 +353,7 @@ class ManufacturerViewSet(CompanyScopedViewSet):
     search_fields = ['name']
     ordering_fields = ['name']
     ordering = ['name']
+    cursor_ordering = ('name', 'id')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -287,9 +380,10 @@ class CertificationViewSet(viewsets.ModelViewSet):
     filterset_fields = ['manufacturer', 'technician']
     search_fields = ['certificate_number', 'manufacturer__name', 'technician__first_name', 'technician__last_name']
     ordering = ['-expiry_date']
+    cursor_ordering = ('-expiry_date', 'id')
 
     def get_queryset(self):
-        company = self.request.user.technician_profile.company
+        company = get_company_context(self.request).company
         return Certification.objects.select_related('technician', 'manufacturer').filter(
             technician__company=company
         )
@@ -316,10 +410,19 @@ class NumberInFilter(df_filters.BaseInFilter, df_filters.NumberFilter):
 class FiscalDeviceFilter(df_filters.FilterSet):
     owner__id__in = NumberInFilter(field_name='owner_id', lookup_expr='in')
     brand__id__in = NumberInFilter(field_name='brand_id', lookup_expr='in')
+    due_before = df_filters.DateFilter(field_name='next_service_date', lookup_expr='lte')
+    due_after = df_filters.DateFilter(field_name='next_service_date', lookup_expr='gte')
 
     class Meta:
         model = FiscalDevice
-        fields = ['status', 'brand', 'owner__id__in', 'brand__id__in']
+        fields = ['status', 'brand', 'owner__id__in', 'brand__id__in', 'due_before', 'due_after']
+
+
+class DeviceHistoryPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-event_date', '-id')
+    always_paginate = True
 
 
 class FiscalDeviceViewSet(viewsets.ModelViewSet):
@@ -328,16 +431,30 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
     filterset_class = FiscalDeviceFilter
     search_fields = ['model_name', 'serial_number', 'unique_number', 'owner__name']
     ordering = ['-sale_date']
+    cursor_ordering = ('-sale_date', 'id')
+
+    # Historia urządzenia jest dołączana tylko do widoków pojedynczego urządzenia;
+    # lista korzysta z lekkiej reprezentacji, a pełna historia jest pod /devices/{id}/history/.
+    history_actions = ['retrieve', 'perform_service']
 
     def get_queryset(self):
-        company = self.request.user.technician_profile.company
-        return FiscalDevice.objects.select_related('owner', 'brand').filter(
+        company = get_company_context(self.request).company
+        if self.action == 'export':
+            return FiscalDevice.objects.filter(owner__company=company)
+
+        queryset = FiscalDevice.objects.select_related('owner', 'brand').filter(
             owner__company=company
-        ).prefetch_related('history_entries__actor').annotate(tickets_count=Count('tickets'))
+        ).annotate(tickets_count=Count('tickets'))
+
+        if self.action in self.history_actions:
+            queryset = queryset.prefetch_related('history_entries__actor')
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return FiscalDeviceWriteSerializer
+        if self.action == 'list':
+            return FiscalDeviceListSerializer
         return FiscalDeviceReadSerializer
 
     def create(self, request, *args, **kwargs):
@@ -351,22 +468,75 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(write_serializer.data)
         return Response(read_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_csv_response(queryset, DEVICE_CSV_COLUMNS, 'urzadzenia.csv')
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        rows, error_response = parse_bulk_rows(request, FiscalDeviceBulkItemSerializer)
+        if error_response:
+            return error_response
+
+        company = get_company_context(request).company
+        errors = validate_bulk_devices(company, rows)
+        if errors:
+            return bulk_errors_response(errors)
+
+        devices = bulk_create_devices(company, rows, actor=request.user)
+        for device in devices:
+            device.tickets_count = 0
+        serializer = FiscalDeviceListSerializer(devices, many=True, context=self.get_serializer_context())
+        return Response({"created": len(devices), "results": serializer.data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        device = self.get_object()
+        queryset = DeviceHistoryEntry.objects.filter(device=device).select_related('actor')
+
+        paginator = DeviceHistoryPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = DeviceHistoryEntrySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['get'], url_path='eligible-technicians')
     def eligible_technicians(self, request, pk=None):
         device = self.get_object()
-        company = request.user.technician_profile.company
-        today = timezone.now().date()
+        company = get_company_context(request).company
 
         eligible_techs = Technician.objects.filter(
             company=company,
-            is_active=True,
-            certifications__manufacturer=device.brand,
-            certifications__expiry_date__gte=today
-        ).distinct()
+            id__in=eligible_technician_ids(company.id, device.brand_id),
+        )
 
         serializer = TechnicianSummarySerializer(eligible_techs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def eligibility(self, request):
+        """Uprawnieni serwisanci dla listy urządzeń (?ids=1,2,3) - jedno odczytanie mapy uprawnień."""
+        try:
+            device_ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({"detail": "Parametr ids musi być listą liczb."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(device_ids) > BULK_MAX_ROWS:
+            return Response({"detail": f"Maksymalnie {BULK_MAX_ROWS} urządzeń w jednym zapytaniu."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        company = get_company_context(request).company
+        eligibility = get_eligibility_map(company.id)
+        devices = FiscalDevice.objects.filter(owner__company=company, id__in=device_ids).values_list('id', 'brand_id')
+
+        by_device = {str(device_id): eligibility.get(brand_id, []) for device_id, brand_id in devices}
+        technician_ids = {technician_id for ids in by_device.values() for technician_id in ids}
+        technicians = Technician.objects.filter(company=company, id__in=technician_ids)
+
+        return Response({
+            "devices": by_device,
+            "technicians": TechnicianSummarySerializer(technicians, many=True).data,
+        })
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsCompanyAdmin])
     def remind(self, request, pk=None):
         try:
@@ -382,11 +552,6 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
 
         send_device_inspection_reminder.delay(device_id=device.id)
 
-        if hasattr(device, 'last_reminder_sent'):
-            device.last_reminder_sent = timezone.now()
-            device.reminder_count = (getattr(device, 'reminder_count', 0) or 0) + 1
-            device.save(update_fields=['last_reminder_sent', 'reminder_count'])
-
         return Response({"detail": f"Zlecono wysłanie przypomnienia dla urządzenia {device.unique_number}."},
                         status=status.HTTP_202_ACCEPTED)
 
@@ -399,23 +564,28 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Oczekiwano listy ID urządzeń w polu 'device_ids'."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        company = request.user.technician_profile.company
-        devices = FiscalDevice.objects.filter(
+        company = get_company_context(request).company
+        rows = FiscalDevice.objects.filter(
             id__in=device_ids,
             owner__company=company
-        )
+        ).values_list('id', 'unique_number', 'owner__email')
 
-        sent_count = 0
+        ids_to_send = []
         skipped_no_email = []
 
-        from api.tasks import send_device_inspection_reminder
-
-        for device in devices:
-            if getattr(device.owner, 'email', None):
-                send_device_inspection_reminder.delay(device_id=device.id)
-                sent_count += 1
+        for device_id, unique_number, owner_email in rows:
+            if owner_email:
+                ids_to_send.append(device_id)
             else:
-                skipped_no_email.append(device.unique_number or device.id)
+                skipped_no_email.append(unique_number or device_id)
+
+        from api.tasks import send_device_inspection_reminders_batch
+
+        batch_size = int(getattr(settings, 'REMINDER_BATCH_SIZE', 100))
+        for start in range(0, len(ids_to_send), batch_size):
+            send_device_inspection_reminders_batch.delay(ids_to_send[start:start + batch_size])
+
+        sent_count = len(ids_to_send)
 
         response_data = {
             "detail": f"Zlecono wysłanie {sent_count} przypomnień.",
@@ -436,11 +606,12 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
         try:
             technician = Technician.objects.get(
                 id=technician_id,
-                company=request.user.technician_profile.company
+                company=get_company_context(request).company
             )
 
+            # Decyzja o uprawnieniach zawsze z bazy (indeks producent + data ważności), nie z mapy w cache.
             has_valid_certification = technician.certifications.filter(
-                manufacturer=device.brand,
+                manufacturer_id=device.brand_id,
                 expiry_date__gte=today
             ).exists()
 
@@ -453,7 +624,7 @@ class FiscalDeviceViewSet(viewsets.ModelViewSet):
 
         with transaction.atomic():
             device.last_service_date = today
-            device.save(update_fields=['last_service_date'])
+            device.save(update_fields=['last_service_date', 'next_service_date'])
 
             DeviceHistoryEntry.objects.create(
                 device=device,
@@ -472,18 +643,19 @@ class ServiceTicketViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'ticket_type', 'assigned_technician', 'client', 'device']
     search_fields = ['ticket_number', 'title', 'description', 'client__name']
     ordering = ['-created_at']
+    cursor_ordering = ('-created_at', 'id')
 
     def get_queryset(self):
-        user = self.request.user
-        company = user.technician_profile.company
+        context = get_company_context(self.request)
+        company = context.company
 
-        if user.technician_profile.is_admin:
+        if context.is_admin:
             return ServiceTicket.objects.filter(client__company=company).select_related(
                 'client', 'device', 'assigned_technician'
             )
         return ServiceTicket.objects.filter(
             client__company=company,
-            assigned_technician=user.technician_profile
+            assigned_technician=context.technician
         ).select_related('client', 'device', 'assigned_technician')
 
     def get_permissions(self):
@@ -502,7 +674,7 @@ class ServiceTicketViewSet(viewsets.ModelViewSet):
             if list(self.request.data.keys()) == ['status']:
                 return ServiceTicketTechnicianUpdateSerializer
 
-            if self.request.user.technician_profile.is_admin:
+            if get_company_context(self.request).is_admin:
                 return ServiceTicketWriteSerializer
 
             return ServiceTicketTechnicianUpdateSerializer
@@ -523,6 +695,11 @@ class ServiceTicketViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(write_serializer.data)
         return Response(read_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return streaming_csv_response(queryset, TICKET_CSV_COLUMNS, 'zgloszenia.csv')
+
     @action(detail=True, methods=['post'], url_path='resolve')
     def resolve(self, request, pk=None):
         ticket = self.get_object()
@@ -562,6 +739,7 @@ class OrderViewSet(CompanyScopedViewSet):
     filterset_fields = ['status', 'email']
     search_fields = ['stripe_payment_intent', 'stripe_session_id', 'email']
     ordering = ['-created_at']
+    cursor_ordering = ('-created_at', 'id')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -585,10 +763,11 @@ class ActivationCodeViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['used', 'email']
     search_fields = ['code', 'email']
     ordering = ['-created_at']
+    cursor_ordering = ('-created_at', 'id')
     serializer_class = ActivationCodeReadSerializer
 
     def get_queryset(self):
-        company = self.request.user.technician_profile.company
+        company = get_company_context(self.request).company
         return ActivationCode.objects.select_related('order', 'used_by').filter(order__company=company)
 
 
@@ -596,17 +775,14 @@ class DashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
     def get(self, request):
-        company = request.user.technician_profile.company
-
-        thirty_days_from_now = timezone.now().date() + timedelta(days=30)
+        company = get_company_context(request).company
+        counters = get_company_counters(company)
 
         stats = {
-            "open_tickets": ServiceTicket.objects.filter(client__company=company,
-                                                         status=ServiceTicket.Status.OPEN).count(),
-            "devices_count": FiscalDevice.objects.filter(owner__company=company).count(),
-            "clients_count": Client.objects.filter(company=company).count(),
-            "expiring_certifications_30d": Certification.objects.filter(technician__company=company,
-                                                                        expiry_date__lte=thirty_days_from_now).count()
+            "open_tickets": counters.open_tickets_count,
+            "devices_count": counters.devices_count,
+            "clients_count": counters.clients_count,
+            "expiring_certifications_30d": counters.expiring_certifications_count,
         }
         return Response(stats, status=status.HTTP_200_OK)
 
@@ -639,69 +815,50 @@ def fetch_company_data(request, nip):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    cleaned_nip = result
-    today = datetime.today().strftime("%Y-%m-%d")
-    url = f"https://wl-api.mf.gov.pl/api/search/nip/{cleaned_nip}?date={today}"
-
     try:
-        with requests.Session() as session:
-            response = session.get(url, timeout=10)
+        company_data = lookup_company(result)
+    except WhiteListError as e:
+        return Response({"detail": e.detail}, status=e.status_code)
 
-            if response.status_code == 400:
-                return Response(
-                    {"detail": "Nieprawidłowy format zapytania do API MF"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+    if company_data is None:
+        return Response({"detail": NOT_FOUND_DETAIL}, status=status.HTTP_404_NOT_FOUND)
+    return Response(company_data, status=status.HTTP_200_OK)
 
-            response.raise_for_status()
 
-        data = response.json()
+COMPANY_DATA_BATCH_LIMIT = 100
 
-        if 'code' in data:
-            error_msg = data.get('message', 'Błąd API Ministerstwa Finansów')
-            return Response(
-                {"detail": error_msg},
-                status=status.HTTP_404_NOT_FOUND
-            )
 
-        result_data = data.get('result', {})
-        subject_data = result_data.get('subject')
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def fetch_company_data_batch(request):
+    nips = request.data.get('nips')
+    if not isinstance(nips, list) or not nips:
+        return Response({"detail": "Oczekiwano listy numerów NIP w polu 'nips'."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(nips) > COMPANY_DATA_BATCH_LIMIT:
+        return Response({"detail": f"Można sprawdzić maksymalnie {COMPANY_DATA_BATCH_LIMIT} numerów NIP naraz."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    validated = [(str(nip), *validate_nip(str(nip))) for nip in nips]
 
-        if not subject_data:
-            return Response(
-                {"detail": "Nie znaleziono firmy o podanym NIP w rejestrze"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    try:
+        companies = lookup_companies([cleaned for _, is_valid, cleaned in validated if is_valid])
+    except WhiteListError as e:
+        return Response({"detail": e.detail}, status=e.status_code)
+
+    results = []
+    for nip, is_valid, cleaned in validated:
+        if not is_valid:
+            results.append({"nip": nip, "status": status.HTTP_400_BAD_REQUEST, "detail": cleaned})
+        elif isinstance(companies.get(cleaned), WhiteListError):
+            error = companies[cleaned]
+            results.append({"nip": nip, "status": error.status_code, "detail": error.detail})
+        elif companies.get(cleaned) is None:
+            results.append({"nip": nip, "status": status.HTTP_404_NOT_FOUND, "detail": NOT_FOUND_DETAIL})
+        else:
+            results.append({"nip": nip, "status": status.HTTP_200_OK, "data": companies[cleaned]})
 
-        cleaned_data = {
-            'name': subject_data.get('name', ''),
-            'nip': subject_data.get('nip', ''),
-            'regon': subject_data.get('regon', ''),
-            'address': subject_data.get('workingAddress') or subject_data.get('residenceAddress') or ''
-        }
-        return Response(cleaned_data, status=status.HTTP_200_OK)
-    except requests.exceptions.Timeout:
-        return Response(
-            {"detail": "Serwer Ministerstwa Finansów nie odpowiada. Spróbuj ponownie później."},
-            status=status.HTTP_504_GATEWAY_TIMEOUT
-        )
-    except requests.exceptions.ConnectionError:
-        return Response(
-            {"detail": "Nie można połączyć się z usługą Białej Listy. Sprawdź połączenie internetowe."},
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Fetch company data error for NIP {cleaned_nip}: {e}")
-        return Response(
-            {"detail": "Wystąpił błąd podczas pobierania danych z API MF"},
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
-    except (KeyError, ValueError, json.JSONDecodeError) as e:
-        logger.error(f"Parse error for NIP {cleaned_nip}: {e}")
-        return Response(
-            {"detail": "Otrzymano nieprawidłową odpowiedź z API MF"},
-            status=status.HTTP_502_BAD_GATEWAY
-        )
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
 import traceback
 import logging
@@ -972,162 +1129,71 @@ def redeem_activation_code(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsCompanyAdmin])
 def export_device_pdf(request, device_id):
-    try:
-        company = request.user.technician_profile.company
+    company = get_company_context(request).company
+
+    version = get_device_version(device_id, company)
+    if version is None:
+        return Response({'error': 'Nie znaleziono urządzenia.'}, status=status.HTTP_404_NOT_FOUND)
+
+    fingerprint = version['fingerprint']
+    etag = f'"{fingerprint}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
 
+    pdf_file = read_cached_pdf(fingerprint)
+    if pdf_file is None:
         device = FiscalDevice.objects.select_related(
             'owner',
             'brand'
         ).prefetch_related(
             'tickets__assigned_technician',
             'history_entries__actor'
-        ).get(
-            id=device_id,
-            owner__company=company
-        )
-    except FiscalDevice.DoesNotExist:
-        return Response({'error': 'Nie znaleziono urządzenia.'}, status=status.HTTP_404_NOT_FOUND)
+        ).get(id=device_id)
 
-    context = {
-        'device': device,
-        'generation_date': timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+        context = {
+            'device': device,
+            'generation_date': timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
 
-    html_string = render_to_string('device_report.html', context)
-    pdf_file = HTML(string=html_string).write_pdf()
+        html_string = render_to_string('device_report.html', context)
+        pdf_file = HTML(string=html_string).write_pdf()
+        store_cached_pdf(fingerprint, pdf_file)
 
     response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="raport_urzadzenia_{device.unique_number}.pdf"'
+    response['Content-Disposition'] = f'attachment; filename="raport_urzadzenia_{version["unique_number"]}.pdf"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
 
     return response
 
-from django.db.models import Count
-from django.db.models.functions import TruncMonth
-
-
 class ChartView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
     def get(self, request, *args, **kwargs):
-        company = request.user.technician_profile.company
-
-        tickets_by_status_qs = ServiceTicket.objects.filter(
-            client__company=company
-        ).values('status').annotate(count=Count('id')).order_by('status')
-        status_labels_map = dict(ServiceTicket.Status.choices)
-        tickets_by_status_data = {
-            "labels": [status_labels_map.get(item['status'], item['status']) for item in tickets_by_status_qs],
-            "data": [item['count'] for item in tickets_by_status_qs]
-        }
-
-        twelve_months_ago = timezone.now().date() - relativedelta(months=11)
-        twelve_months_ago = twelve_months_ago.replace(day=1)
-
-        tickets_by_month_and_type = ServiceTicket.objects.filter(
-            client__company=company,
-            created_at__gte=twelve_months_ago
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month', 'ticket_type').annotate(count=Count('id')).order_by('month')
-
-        monthly_data = defaultdict(lambda: defaultdict(int))
-        for item in tickets_by_month_and_type:
-            month_str = item['month'].strftime('%Y-%m')
-            monthly_data[month_str][item['ticket_type']] += item['count']
-
-        all_months_labels = []
-        today = date.today()
-        for i in range(12, 0, -1):
-            month_date = today - relativedelta(months=i - 1)
-            all_months_labels.append(month_date.strftime('%Y-%m'))
-
-        colors = {
-            ServiceTicket.TicketType.SERVICE: {'bg': 'rgba(75, 192, 192, 0.7)', 'border': 'rgb(75, 192, 192)'},
-            ServiceTicket.TicketType.REPAIR: {'bg': 'rgba(255, 99, 132, 0.7)', 'border': 'rgb(255, 99, 132)'},
-            ServiceTicket.TicketType.READING: {'bg': 'rgba(54, 162, 235, 0.7)', 'border': 'rgb(54, 162, 235)'},
-            ServiceTicket.TicketType.OTHER: {'bg': 'rgba(201, 203, 207, 0.7)', 'border': 'rgb(201, 203, 207)'},
-        }
-
-        datasets = []
-        for ticket_type_value, ticket_type_label in ServiceTicket.TicketType.choices:
-            data_for_all_months = [monthly_data[month].get(ticket_type_value, 0) for month in all_months_labels]
-            color_set = colors.get(ticket_type_value)
-
-            dataset = {
-                "label": ticket_type_label,
-                "data": data_for_all_months,
-                "backgroundColor": color_set['bg'],
-                "borderColor": color_set['border'],
-            }
-            datasets.append(dataset)
-
-        workload_over_time_data = {
-            "labels": [datetime.strptime(m, '%Y-%m').strftime('%B %Y') for m in all_months_labels],
-            "datasets": datasets
-        }
-
-        devices_by_status_qs = FiscalDevice.objects.filter(
-            owner__company=company
-        ).values('status').annotate(count=Count('id')).order_by('status')
-        device_status_map = dict(FiscalDevice.Status.choices)
-        devices_by_status_data = {
-            "labels": [device_status_map.get(item['status'], item['status']) for item in devices_by_status_qs],
-            "data": [item['count'] for item in devices_by_status_qs]
-        }
-
-        ninety_days_from_now = timezone.now().date() + timedelta(days=90)
-        expiring_certs_qs = Certification.objects.filter(
-            technician__company=company,
-            expiry_date__lte=ninety_days_from_now,
-            expiry_date__gte=timezone.now().date()
-        ).select_related('technician__user', 'manufacturer').order_by('expiry_date')
-        expiring_certs_data = [
-            {
-                "technician": cert.technician.full_name,
-                "manufacturer": cert.manufacturer.name,
-                "certificate_number": cert.certificate_number,
-                "expiry_date": cert.expiry_date.strftime('%Y-%m-%d'),
-            } for cert in expiring_certs_qs
-        ]
+        company = get_company_context(request).company
+        return Response(get_chart_data(company), status=status.HTTP_200_OK)
 
-        response_data = {
-            "tickets_by_status": tickets_by_status_data,
-            "workload_over_time": workload_over_time_data,
-            "devices_by_status": devices_by_status_data,
-            "expiring_certifications": expiring_certs_data,
-        }
-        return Response(response_data, status=status.HTTP_200_OK)
-
-
-class CSVRenderer(BaseRenderer):
-    media_type = 'text/csv'
-    format = 'csv'
-    charset = 'utf-8'
-
-    def render(self, data, media_type=None, renderer_context=None):
-        if not data:
-            return ""
 
-        if not isinstance(data, list) or not isinstance(data[0], dict):
-            return JSONRenderer().render(data, media_type, renderer_context)
-
-        headers = data[0].keys()
-
-        from io import StringIO
-        string_buffer = StringIO()
-        writer = csv.DictWriter(string_buffer, fieldnames=headers)
+class TimeToCloseAnalyticsView(APIView):
+    """Mediana, p90 i średni czas realizacji zgłoszeń zamkniętych w okresie - wg serwisanta, typu i producenta."""
+    permission_classes = [IsAuthenticated, IsCompanyAdmin]
 
-        writer.writeheader()
-        writer.writerows(data)
+    def get(self, request, *args, **kwargs):
+        serializer = TimeToCloseParameterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        company = get_company_context(request).company
 
-        return string_buffer.getvalue().encode(self.charset)
+        return Response(get_time_to_close(company, params['date_from'], params['date_to']))
 
 
 class ReportFilterOptionsView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdmin]
 
     def get(self, request, *args, **kwargs):
-        company = request.user.technician_profile.company
+        company = get_company_context(request).company
 
         clients = Client.objects.filter(company=company).values('id', 'name')
         technicians = Technician.objects.filter(company=company).values('id', 'first_name', 'last_name')
@@ -1143,9 +1209,6 @@ class ReportFilterOptionsView(APIView):
                                    ServiceTicket.Resolution.choices],
         })
 
-from django.db.models import Prefetch
-
-
 class GenerateReportView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyAdmin]
     renderer_classes = [JSONRenderer]
@@ -1154,58 +1217,82 @@ class GenerateReportView(APIView):
         serializer = ReportParameterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         params = serializer.validated_data
-        company = request.user.technician_profile.company
+        company = get_company_context(request).company
 
-        queryset = FiscalDevice.objects.filter(owner__company=company)
+        output_format = params.get('output_format', 'json')
 
-        if params.get('clients'):
-            queryset = queryset.filter(owner_id__in=params['clients'])
-        if params.get('devices'):
-            queryset = queryset.filter(id__in=params['devices'])
-        if params.get('device_brands'):
-            queryset = queryset.filter(brand_id__in=params['device_brands'])
+        if output_format == 'pdf':
+            job = ReportJob.objects.create(
+                company=company,
+                requested_by=request.user,
+                output_format=output_format,
+                parameters=serializer.data,
+            )
+            transaction.on_commit(lambda: generate_report_job.delay(str(job.id)))
 
-        prefetch_list = [
-            'owner',
-            'brand'
-        ]
+            job_data = ReportJobSerializer(job, context={'request': request}).data
+            job_data['status_url'] = request.build_absolute_uri(reverse('reportjob-detail', kwargs={'pk': job.pk}))
+            return Response(job_data, status=status.HTTP_202_ACCEPTED)
 
-        if params.get('include_service_history'):
-            tickets_queryset = ServiceTicket.objects.select_related('assigned_technician').order_by('-created_at')
-            if params.get('history_date_from'):
-                tickets_queryset = tickets_queryset.filter(created_at__date__gte=params['history_date_from'])
-            if params.get('history_date_to'):
-                tickets_queryset = tickets_queryset.filter(created_at__date__lte=params['history_date_to'])
+        if output_format == 'csv':
+            if params.get('include_service_history'):
+                tickets = filter_report_tickets(company, params)
+                return streaming_csv_response(tickets, TICKET_CSV_COLUMNS, 'raport_zlecen.csv')
+            devices = filter_report_devices(company, params)
+            return streaming_csv_response(devices, DEVICE_CSV_COLUMNS, 'raport_zbiorczy_urzadzen.csv')
 
-            prefetch_list.append(
-                Prefetch('tickets', queryset=tickets_queryset, to_attr='filtered_tickets')
-            )
+        devices = build_report_devices(company, params)
+        report_data = FiscalDeviceReadSerializer(devices, many=True).data
+        return Response(report_data)
 
-        if params.get('include_event_log'):
-            prefetch_list.append(Prefetch('history_entries',
-                                          queryset=DeviceHistoryEntry.objects.select_related('actor').order_by(
-                                              '-event_date')))
 
-        devices = queryset.prefetch_related(*prefetch_list).order_by('owner__name', 'model_name')
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [IsAuthenticated, IsCompanyAdmin]
+    serializer_class = ReportJobSerializer
+    cursor_ordering = ('-created_at', 'id')
 
-        output_format = params.get('output_format', 'json')
+    def get_queryset(self):
+        company = get_company_context(self.request).company
+        return ReportJob.objects.filter(company=company)
 
-        if output_format == 'pdf':
-            context = {
-                'devices': devices,
-                'params': params,
-                'generation_date': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'company_name': company.name
-            }
-            html_string = render_to_string('reports/generic_report.html', context)
-            pdf_file = HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf()
-
-            response = HttpResponse(pdf_file, content_type='application/pdf')
-            response['Content-Disposition'] = 'attachment; filename="raport_zbiorczy_urzadzen.pdf"'
-            return response
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
 
-        report_data = FiscalDeviceReadSerializer(devices, many=True).data
-        return Response(report_data)
+        if job.status != ReportJob.Status.DONE or not job.file:
+            return Response({"detail": "Raport nie jest jeszcze gotowy."}, status=status.HTTP_409_CONFLICT)
+
+        filename = f"raport_zbiorczy_urzadzen.{job.output_format}"
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Import klientów, urządzeń i certyfikatów z CSV/XLSX - plik przetwarzany jest w tle paczkami."""
+    permission_classes = [IsAuthenticated, IsCompanyAdmin]
+    serializer_class = ImportJobSerializer
+    cursor_ordering = ('-created_at', 'id')
+
+    def get_queryset(self):
+        company = get_company_context(self.request).company
+        return ImportJob.objects.filter(company=company)
+
+    def create(self, request, *args, **kwargs):
+        serializer = ImportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+
+        job = ImportJob.objects.create(
+            company=get_company_context(request).company,
+            requested_by=request.user,
+            kind=serializer.validated_data['kind'],
+            file=upload,
+            original_filename=upload.name[:255],
+        )
+        transaction.on_commit(lambda: run_import_job.delay(str(job.id)))
+
+        job_data = ImportJobSerializer(job, context={'request': request}).data
+        job_data['status_url'] = request.build_absolute_uri(reverse('importjob-detail', kwargs={'pk': job.pk}))
+        return Response(job_data, status=status.HTTP_202_ACCEPTED)
 
 from .tasks import send_email_task
 
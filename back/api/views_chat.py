@@ -1,12 +1,65 @@
+from uuid import UUID
+
+from django.db import transaction
 from rest_framework import viewsets, permissions
-from rest_framework.pagination import LimitOffsetPagination
-from .models.chat import Message
-from .serializers_chat import MessageSerializer
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .models.chat import Message, ChatReadMarker
+from .context import get_company_context
+from .pagination import KeysetPagination
+from .serializers_chat import MessageSerializer, ChatReadMarkerSerializer, ChatReadMarkerUpdateSerializer
 from .views import IsCompanyMember  # Importujemy Twoje istniejące uprawnienie
 
-class MessagePagination(LimitOffsetPagination):
-    default_limit = 10
-    max_limit = 100
+MESSAGE_NOT_FOUND = "Nie znaleziono wiadomości."
+
+
+def find_message(queryset, reference):
+    """Wiadomość po ID lub UUID (wiadomości z WebSocket mają ID dopiero po zapisie paczki)."""
+    reference = str(reference).strip()
+    if reference.isdecimal() and reference.isascii():
+        lookup = {'pk': int(reference)}
+    else:
+        try:
+            lookup = {'uuid': UUID(reference)}
+        except ValueError:
+            return None
+    return queryset.filter(**lookup).select_related(None).order_by().only('id', 'uuid', 'timestamp').first()
+
+
+def messages_after(queryset, message):
+    return queryset.filter(KeysetPagination._seek_filter(('timestamp', 'id'), [message.timestamp, message.id]))
+
+
+class MessagePagination(KeysetPagination):
+    """
+    Historia czatu od najnowszych wiadomości.
+
+    Poza kursorem z linków `next`/`previous` stronę można zakotwiczyć na wiadomości:
+    `?before=<id|uuid>` zwraca starsze, a `?after=<id|uuid>` nowsze od niej wiadomości.
+    """
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    ordering = ('-timestamp', '-id')
+    always_paginate = True
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def get_position(self, request, queryset):
+        if request.query_params.get(self.cursor_query_param):
+            return super().get_position(request, queryset)
+
+        for param, reverse in ((self.before_query_param, False), (self.after_query_param, True)):
+            reference = request.query_params.get(param)
+            if reference:
+                message = find_message(queryset, reference)
+                if message is None:
+                    raise NotFound(MESSAGE_NOT_FOUND)
+                return [message.timestamp, message.id], reverse
+
+        return None, False
 
 class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MessageSerializer
@@ -14,7 +67,41 @@ class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = MessagePagination
 
     def get_queryset(self):
-        technician = self.request.user.technician_profile
+        technician = get_company_context(self.request).technician
         queryset = Message.objects.filter(company=technician.company).select_related('sender')
 
-        return queryset.order_by('-timestamp')
\ No newline at end of file
+        return queryset.order_by('-timestamp')
+
+    @action(detail=False, methods=['get', 'put'], url_path='read-marker')
+    def read_marker(self, request):
+        technician = get_company_context(request).technician
+        queryset = Message.objects.filter(company_id=technician.company_id)
+
+        if request.method == 'PUT':
+            serializer = ChatReadMarkerUpdateSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            message = find_message(queryset, serializer.validated_data['message'])
+            if message is None:
+                raise NotFound(MESSAGE_NOT_FOUND)
+
+            with transaction.atomic():
+                ChatReadMarker.objects.get_or_create(technician=technician)
+                marker = ChatReadMarker.objects.select_for_update().get(technician=technician)
+
+                # Znacznik tylko przesuwa się do przodu - odczyt na starszym urządzeniu go nie cofa.
+                # Blokada wiersza szereguje równoległe zapisy z kilku urządzeń.
+                current = marker.last_read_message
+                if current is None or (message.timestamp, message.id) > (current.timestamp, current.id):
+                    marker.last_read_message = message
+                    marker.save(update_fields=['last_read_message', 'updated_at'])
+        else:
+            marker = ChatReadMarker.objects.select_related('last_read_message').filter(technician=technician).first()
+            if marker is None:
+                marker = ChatReadMarker(technician=technician)
+
+        unread = queryset.exclude(sender=technician)
+        if marker.last_read_message is not None:
+            unread = messages_after(unread, marker.last_read_message)
+
+        serializer = ChatReadMarkerSerializer(marker, context={'unread_count': unread.count()})
+        return Response(serializer.data)
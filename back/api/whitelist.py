@@ -0,0 +1,181 @@
+import json
+import logging
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from rest_framework import status
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+WHITELIST_API_URL = 'https://wl-api.mf.gov.pl/api'
+WHITELIST_TIMEOUT = 10
+# API MF przyjmuje do 30 numerów NIP w jednym zapytaniu /search/nips/.
+WHITELIST_BULK_SIZE = 30
+
+NOT_FOUND_DETAIL = "Nie znaleziono firmy o podanym NIP w rejestrze"
+
+_session = None
+
+
+class WhiteListError(Exception):
+    def __init__(self, detail, status_code=status.HTTP_503_SERVICE_UNAVAILABLE):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def get_session():
+    # Jedna sesja na proces: pula połączeń keep-alive do API MF zamiast nowego połączenia TLS na każde zapytanie.
+    global _session
+    if _session is None:
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def _cache_key(nip, on_date):
+    return f'whitelist:nip:{nip}:{on_date}'
+
+
+def _cache_timeouts():
+    return (
+        int(getattr(settings, 'WHITELIST_CACHE_TTL', 24 * 60 * 60)),
+        int(getattr(settings, 'WHITELIST_NEGATIVE_CACHE_TTL', 60 * 60)),
+    )
+
+
+def _serialize_subject(subject):
+    return {
+        'name': subject.get('name', ''),
+        'nip': subject.get('nip', ''),
+        'regon': subject.get('regon', ''),
+        'address': subject.get('workingAddress') or subject.get('residenceAddress') or ''
+    }
+
+
+def _request(path, on_date):
+    try:
+        response = get_session().get(f'{WHITELIST_API_URL}{path}', params={'date': on_date}, timeout=WHITELIST_TIMEOUT)
+
+        if response.status_code == 400:
+            raise WhiteListError("Nieprawidłowy format zapytania do API MF", status.HTTP_400_BAD_REQUEST)
+
+        response.raise_for_status()
+        data = response.json()
+    except requests.exceptions.Timeout:
+        raise WhiteListError(
+            "Serwer Ministerstwa Finansów nie odpowiada. Spróbuj ponownie później.",
+            status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except requests.exceptions.ConnectionError:
+        raise WhiteListError(
+            "Nie można połączyć się z usługą Białej Listy. Sprawdź połączenie internetowe.",
+            status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"White List request error for {path}: {e}")
+        raise WhiteListError("Wystąpił błąd podczas pobierania danych z API MF", status.HTTP_503_SERVICE_UNAVAILABLE)
+    except (ValueError, json.JSONDecodeError) as e:
+        logger.error(f"White List parse error for {path}: {e}")
+        raise WhiteListError("Otrzymano nieprawidłową odpowiedź z API MF", status.HTTP_502_BAD_GATEWAY)
+
+    if 'code' in data:
+        raise WhiteListError(data.get('message', 'Błąd API Ministerstwa Finansów'), status.HTTP_404_NOT_FOUND)
+
+    return data.get('result') or {}
+
+
+def _store(results, on_date):
+    # Cache'ujemy tylko odpowiedzi jednoznaczne - dane firmy albo jawne "nie znaleziono" (None).
+    ttl, negative_ttl = _cache_timeouts()
+    for nip, company in results.items():
+        if isinstance(company, WhiteListError):
+            continue
+        cache.set(_cache_key(nip, on_date), company or {}, negative_ttl if company is None else ttl)
+
+
+def _fetch_one(nip, on_date):
+    try:
+        result = _request(f'/search/nip/{nip}', on_date)
+    except WhiteListError as e:
+        return e
+    if 'subject' not in result:
+        return WhiteListError("Otrzymano nieprawidłową odpowiedź z API MF", status.HTTP_502_BAD_GATEWAY)
+    subject = result['subject']
+    return _serialize_subject(subject) if subject else None
+
+
+def _fetch_many(chunk, on_date):
+    try:
+        result = _request(f'/search/nips/{",".join(chunk)}', on_date)
+    except WhiteListError as e:
+        if e.status_code != status.HTTP_404_NOT_FOUND:
+            raise
+        # API odrzuciło całe zapytanie przez jeden z numerów - sprawdzamy je pojedynczo.
+        return {nip: _fetch_one(nip, on_date) for nip in chunk}
+
+    no_answer = WhiteListError("API MF nie zwróciło odpowiedzi dla tego numeru NIP", status.HTTP_502_BAD_GATEWAY)
+    fetched = dict.fromkeys(chunk, no_answer)
+    for entry in result.get('entries') or []:
+        nip = entry.get('identifier')
+        if nip not in fetched:
+            continue
+        error = entry.get('error')
+        if error:
+            fetched[nip] = WhiteListError(
+                error.get('message', 'Błąd API Ministerstwa Finansów'), status.HTTP_404_NOT_FOUND
+            )
+            continue
+        subjects = entry.get('subjects')
+        if subjects is None:
+            continue
+        fetched[nip] = _serialize_subject(subjects[0]) if subjects else None
+    return fetched
+
+
+def lookup_companies(nips, on_date=None):
+    """
+    Zwraca {nip: dane firmy, None lub WhiteListError} dla znormalizowanych numerów NIP.
+
+    Dane firm i jawne odpowiedzi "nie znaleziono" są cache'owane per NIP i dzień, a brakujące
+    numery pobierane są z API MF w paczkach po WHITELIST_BULK_SIZE. Błąd dotyczący jednego
+    numeru trafia do wyniku tego numeru; błędy transportu przerywają całe wyszukiwanie.
+    """
+    on_date = on_date or timezone.localdate().isoformat()
+    nips = list(dict.fromkeys(nips))
+
+    cached = cache.get_many([_cache_key(nip, on_date) for nip in nips])
+    results = {}
+    missing = []
+    for nip in nips:
+        value = cached.get(_cache_key(nip, on_date))
+        if value is None:
+            missing.append(nip)
+        else:
+            results[nip] = value or None
+
+    for start in range(0, len(missing), WHITELIST_BULK_SIZE):
+        chunk = missing[start:start + WHITELIST_BULK_SIZE]
+        if len(chunk) == 1:
+            fetched = {chunk[0]: _fetch_one(chunk[0], on_date)}
+        else:
+            fetched = _fetch_many(chunk, on_date)
+
+        _store(fetched, on_date)
+        results.update(fetched)
+
+    return results
+
+
+def lookup_company(nip, on_date=None):
+    company = lookup_companies([nip], on_date)[nip]
+    if isinstance(company, WhiteListError):
+        raise company
+    return company
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -32,6 +33,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.CompanyContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,6 +72,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
 }
 
 SIMPLE_JWT = {
@@ -77,9 +80,29 @@ SIMPLE_JWT = {
 }
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", REDIS_URL),
+        "KEY_PREFIX": "fiscal",
+        "TIMEOUT": 300,
+    }
+}
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
 
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-dashboard-counters": {
+        "task": "api.tasks.reconcile_dashboard_counters",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "schedule-inspection-reminders": {
+        "task": "api.tasks.schedule_inspection_reminders",
+        "schedule": crontab(hour=7, minute=0),
+    },
+}
+
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173").rstrip("/")
 
 CORS_ALLOWED_ORIGINS = [
@@ -101,4 +124,28 @@ EMAIL_USE_TLS = _env_bool("EMAIL_USE_TLS", "False")
 EMAIL_USE_SSL = _env_bool("EMAIL_USE_SSL", "False")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
-DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER or "no-reply@babik.com.pl")
\ No newline at end of file
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER or "no-reply@babik.com.pl")
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+REMINDER_BATCH_INTERVAL_SECONDS = int(os.getenv("REMINDER_BATCH_INTERVAL_SECONDS", "60"))
+REMINDER_WINDOW_DAYS = int(os.getenv("REMINDER_WINDOW_DAYS", "30"))
+
+WHITELIST_CACHE_TTL = int(os.getenv("WHITELIST_CACHE_TTL", str(24 * 60 * 60)))
+WHITELIST_NEGATIVE_CACHE_TTL = int(os.getenv("WHITELIST_NEGATIVE_CACHE_TTL", str(60 * 60)))
+
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "FiscalDeviceApp")
+GEOCODING_MIN_INTERVAL_SECONDS = float(os.getenv("GEOCODING_MIN_INTERVAL_SECONDS", "1"))
+
+CLIENT_MAP_CLUSTER_MAX_ZOOM = int(os.getenv("CLIENT_MAP_CLUSTER_MAX_ZOOM", "13"))
+
+# Czat: opcjonalnie wiadomości są rozgłaszane od razu, a zapisywane do bazy paczkami (write-behind).
+# Bufor żyje w procesie serwera - awaria procesu traci niezapisane wiadomości, dlatego domyślnie wyłączone.
+CHAT_WRITE_BEHIND = _env_bool("CHAT_WRITE_BEHIND", "False")
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "250"))
+CHAT_FLUSH_MAX_MESSAGES = int(os.getenv("CHAT_FLUSH_MAX_MESSAGES", "100"))
+
+# Tożsamość (użytkownik + serwisant + firma) dla połączeń WebSocket.
+WS_IDENTITY_CACHE_TTL = int(os.getenv("WS_IDENTITY_CACHE_TTL", "60"))
+
+CHART_CACHE_TTL = int(os.getenv("CHART_CACHE_TTL", str(60 * 60)))
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", str(60 * 60)))
+ELIGIBILITY_CACHE_TTL = int(os.getenv("ELIGIBILITY_CACHE_TTL", str(60 * 60)))
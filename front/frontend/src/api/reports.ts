@@ -12,15 +12,42 @@ export async function generateReport(params: ReportParameters): Promise<ReportRe
   return response.data;
 }
 
+interface ReportJob {
+  id: string;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  error: string;
+  download_url: string | null;
+}
+
+const REPORT_POLL_INTERVAL_MS = 2000;
+
+async function waitForReportJob(jobId: string): Promise<ReportJob> {
+  for (;;) {
+    const { data: job } = await api.get<ReportJob>(`/reports/jobs/${jobId}/`);
+    if (job.status === 'done') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Nie udało się wygenerować raportu.');
+    await new Promise(resolve => setTimeout(resolve, REPORT_POLL_INTERVAL_MS));
+  }
+}
+
 export async function downloadReport(params: ReportParameters, format: 'pdf' | 'csv'): Promise<void> {
   const finalParams: ReportParameters = {
     ...params,
     output_format: format
   };
 
-  const response = await api.post('/reports/generate/', finalParams, {
-    responseType: 'blob'
-  });
+  let response;
+  if (format === 'pdf') {
+    const { data: job } = await api.post<ReportJob>('/reports/generate/', finalParams);
+    await waitForReportJob(job.id);
+    response = await api.get(`/reports/jobs/${job.id}/download/`, {
+      responseType: 'blob'
+    });
+  } else {
+    response = await api.post('/reports/generate/', finalParams, {
+      responseType: 'blob'
+    });
+  }
 
   const blob = new Blob([response.data], { type: response.headers['content-type'] });
   const url = window.URL.createObjectURL(blob);
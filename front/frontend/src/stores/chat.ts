@@ -71,7 +71,8 @@ export const useChatStore = defineStore('chat', {
       this.socket.onmessage = (event) => {
         try {
           const newMessage: Message = JSON.parse(event.data);
-          if (newMessage && newMessage.id) {
+          // Wiadomość może jeszcze nie mieć id z bazy (zapis paczkami) - identyfikuje ją uuid.
+          if (newMessage && newMessage.uuid && !this.messages.some((msg) => msg.uuid === newMessage.uuid)) {
             this.messages.push(newMessage);
           }
         } catch (error) {
@@ -215,7 +215,8 @@ export interface TicketResolutionPayload {
 }
 
 export interface Message {
-  id: number;
+  id: number | null;
+  uuid: string;
   sender_id: number;
   sender_name: string;
   content: string;